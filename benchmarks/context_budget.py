@@ -0,0 +1,69 @@
+"""
+Prompt size of the curriculum and summary steps, before and after the context builder.
+
+Tool results are simulated: --results searches each returning --books-per-result
+books from a catalog of --catalog books (so searches overlap), with long
+descriptions. "before" is the old prompts (every result joined, the whole
+curriculum JSON in the summary prompt); "after" uses rank_books,
+build_books_context and compact_curriculum with the default budgets. Tokens are
+counted locally; at an input price per million tokens the saving per run is
+printed too.
+
+    python -m benchmarks.context_budget --results 30 --books-per-result 5
+"""
+import argparse
+import json
+import random
+import time
+
+from src.workflows.context_builder import build_books_context, compact_curriculum, count_tokens, rank_books
+from src.workflows.workflow import CurriculumInput
+from benchmarks.history_size import make_curriculum
+
+def make_tool_results(results: int, books_per_result: int, catalog: int, description_words: int) -> list[str]:
+    rng = random.Random(0)
+    words = "python programming data learning code software design testing functions classes".split()
+    books = [
+        {"title": f"Book {i} on {rng.choice(words)}", "description": " ".join(rng.choice(words) for _ in range(description_words))}
+        for i in range(catalog)
+    ]
+    return [json.dumps({"books": rng.sample(books, books_per_result)}) for _ in range(results)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=30)
+    parser.add_argument("--books-per-result", type=int, default=5)
+    parser.add_argument("--catalog", type=int, default=60)
+    parser.add_argument("--description-words", type=int, default=150)
+    parser.add_argument("--modules", type=int, default=8)
+    parser.add_argument("--price-per-million", type=float, default=0.075, help="USD per million input tokens")
+    args = parser.parse_args()
+
+    defaults = CurriculumInput()
+    tool_results = make_tool_results(args.results, args.books_per_result, args.catalog, args.description_words)
+    curriculum = make_curriculum(args.modules)
+
+    before = {
+        "generate_curriculum": count_tokens(f"Based on these results: {'; '.join(tool_results)}"),
+        "summarize": count_tokens(json.dumps(curriculum)),
+    }
+    start = time.perf_counter()
+    books = rank_books(tool_results, defaults.user_content)
+    context = build_books_context(books, defaults.curriculum_context_tokens)
+    summary_context = compact_curriculum(curriculum, defaults.summary_context_tokens)
+    elapsed = time.perf_counter() - start
+    after = {
+        "generate_curriculum": count_tokens(f"Based on these books:\n{context}"),
+        "summarize": count_tokens(summary_context),
+    }
+
+    print(f"{len(books)} distinct books in {args.results} results, context built in {elapsed * 1000:.2f}ms")
+    print(f"{'step':20s} {'before':>8s} {'after':>8s}")
+    for step in before:
+        print(f"{step:20s} {before[step]:8d} {after[step]:8d}")
+    saved = sum(before.values()) - sum(after.values())
+    print(f"{'total':20s} {sum(before.values()):8d} {sum(after.values()):8d}  "
+          f"saves {saved} tokens, ${saved * args.price_per_million / 1e6:.6f} per run")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Local stand-ins for the services the functions call, shared by the benchmarks.
+
+- FakeWeaviateClient: async Weaviate client serving a synthetic book
+  collection (hybrid, near_text and near_vector queries) with a configurable
+  latency and error rate.
+- FakeGenaiClient: GenAI client whose models answer like Gemini does for this
+  app: search tool calls, curriculum JSON (also streamed), summaries and WAV
+  audio.
+- FakeGeminiServer: a Gemini quota (requests and tokens per window) that
+  answers 429 when it is exceeded.
+
+src modules read their settings from the environment when imported, so they
+are only imported inside functions here: a benchmark can configure the
+environment first and import this module at any time.
+"""
+import asyncio
+import io
+import json
+import random
+import re
+import time
+import wave
+from collections import deque
+from types import SimpleNamespace
+from typing import Optional
+
+from google.genai import types
+
+COLLECTION = "BookVectorizedByWeaviateEmbeddings"
+WORD = re.compile(r"[a-z0-9]+")
+
+SUBJECTS = [
+    "python", "machine learning", "statistics", "roman history", "french cooking",
+    "quantum physics", "investing", "astronomy", "philosophy", "gardening",
+    "music theory", "databases", "economics", "poetry", "networking",
+]
+KINDS = ["Introduction to", "A Practical Guide to", "Advanced", "The History of", "Essays on", "Learning"]
+
+SAFETY_RATINGS = [
+    types.SafetyRating(category=category, probability="NEGLIGIBLE")
+    for category in (
+        "HARM_CATEGORY_HATE_SPEECH",
+        "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "HARM_CATEGORY_HARASSMENT",
+        "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+    )
+]
+
+class FakeUpstreamError(Exception):
+    code = 503
+    status = "UNAVAILABLE"
+
+class FakeQuotaError(Exception):
+    code = 429
+    status = "RESOURCE_EXHAUSTED"
+
+class FakeLatency:
+    """
+    Sleeps latency plus up to jitter seconds, then fails error_rate of the calls.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    async def wait(self):
+        await asyncio.sleep(self._delay())
+        self._fail()
+
+    def wait_sync(self):
+        time.sleep(self._delay())
+        self._fail()
+
+    def _delay(self) -> float:
+        self.calls += 1
+        return self.latency + self._random.uniform(0, self.jitter)
+
+    def _fail(self):
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise FakeUpstreamError("fake upstream error")
+
+def make_books(count: int, seed: int = 0) -> list[dict]:
+    """
+    Synthetic book collection with the properties of the Weaviate one.
+    """
+    rng = random.Random(seed)
+    books = []
+    for number in range(count):
+        subject = SUBJECTS[number % len(SUBJECTS)]
+        other = rng.choice(SUBJECTS)
+        books.append({
+            "title": f"{rng.choice(KINDS)} {subject.title()} vol. {number // len(SUBJECTS) + 1}",
+            "description": f"A book about {subject} with chapters on {other} for readers at every level. " * 2,
+        })
+    return books
+
+class FakeQuery:
+    """
+    The query API of a collection. Keyword scores are shared words with the
+    query, vector scores are dot products with hashing embeddings, so results
+    depend on the query without any model.
+    """
+
+    def __init__(self, books: list[dict], latency: FakeLatency):
+        from src.functions.embeddings import HashingEmbedder
+
+        self.books = books
+        self.latency = latency
+        self.embedder = HashingEmbedder()
+        self.vectors = self.embedder.embed([f"{book['title']} {book['description']}" for book in books])
+        self.words = [set(WORD.findall(f"{book['title']} {book['description']}".lower())) for book in books]
+
+    def _response(self, scores, limit: int):
+        order = sorted(range(len(self.books)), key=lambda position: -scores[position])[:limit]
+        return SimpleNamespace(objects=[SimpleNamespace(properties=dict(self.books[position])) for position in order])
+
+    def _keyword_scores(self, query: str):
+        words = set(WORD.findall(query.lower()))
+        return [len(words & book_words) for book_words in self.words]
+
+    async def hybrid(self, query, alpha=0.5, limit=2, **kwargs):
+        await self.latency.wait()
+        keyword = self._keyword_scores(query)
+        vector = self.vectors @ self.embedder.embed([query])[0]
+        top = max(keyword) or 1
+        return self._response([alpha * similarity + (1 - alpha) * score / top for score, similarity in zip(keyword, vector)], limit)
+
+    async def near_text(self, query, limit=2, **kwargs):
+        await self.latency.wait()
+        return self._response(self.vectors @ self.embedder.embed([query])[0], limit)
+
+    async def near_vector(self, near_vector, limit=3, **kwargs):
+        await self.latency.wait()
+        vector = list(near_vector)
+        if len(vector) != self.vectors.shape[1]:
+            # Queries embedded by another model, rank by the overlapping dimensions
+            vector = (vector + [0.0] * self.vectors.shape[1])[:self.vectors.shape[1]]
+        return self._response(self.vectors @ vector, limit)
+
+class FakeWeaviateClient:
+    def __init__(self, books: Optional[list[dict]] = None, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+        self.latency = FakeLatency(latency, jitter, error_rate)
+        collection = SimpleNamespace(query=FakeQuery(books if books is not None else make_books(500), self.latency))
+        self.collections = SimpleNamespace(get=lambda name: collection)
+
+    def is_connected(self):
+        return True
+
+    async def is_ready(self):
+        return True
+
+    async def close(self):
+        pass
+
+def make_response(parts: list[types.Part], prompt_tokens: int, parsed=None) -> types.GenerateContentResponse:
+    output_tokens = sum(len(part.text or "") for part in parts) // 4 + 10
+    response = types.GenerateContentResponse(
+        candidates=[types.Candidate(
+            content=types.Content(role="model", parts=parts),
+            finish_reason="STOP",
+            safety_ratings=SAFETY_RATINGS,
+            avg_logprobs=-0.12,
+        )],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens,
+        ),
+        model_version="gemini-1.5-flash",
+    )
+    response.parsed = parsed
+    return response
+
+def make_curriculum(modules: int, topic: str = "Python Programming") -> dict:
+    return {
+        "title": f"{topic} from Scratch",
+        "description": "A structured path from first steps to confident, idiomatic practice. " * 2,
+        "difficulty_level": "Beginner",
+        "estimated_duration": f"{modules * 2} weeks",
+        "prerequisites": ["Basic computer skills"],
+        "modules": [
+            {
+                "module_number": number,
+                "title": f"Module {number}: core topic {number}",
+                "description": "What this module covers and why it matters for the learner. " * 3,
+                "learning_objectives": [f"Objective {i} of module {number}" for i in range(4)],
+                "required_reading": [
+                    {"title": f"Book {number}", "author": "Author Name", "pages": "1-120", "notes": "Read chapters 1 to 4"}
+                ],
+                "assignments": [f"Assignment {i}" for i in range(2)],
+            }
+            for number in range(1, modules + 1)
+        ],
+    }
+
+def make_wav(seconds: float, sample_rate: int = 24000) -> bytes:
+    """
+    16-bit mono silence in a WAV container, like a TTS answer.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(b"\0\0" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+def content_text(contents) -> str:
+    texts = []
+    for content in contents:
+        if isinstance(content, str):
+            texts.append(content)
+        else:
+            texts.extend(part.text or "" for part in content.parts or [])
+    return "\n".join(texts)
+
+class FakeGeminiModels:
+    """
+    client.aio.models of a FakeGenaiClient. What it answers depends on the
+    request, like the real model for the app's prompts:
+
+    - tools and a single user turn: one call per search tool for the topic
+    - tools in a later round: a plain answer, which ends the tool loop
+    - a response schema: a curriculum with modules curriculum modules
+    - audio/wav: seconds_per_char seconds of silence per character
+    - anything else: a two-sentence summary
+    """
+
+    def __init__(self, latency: FakeLatency, modules: int = 8, seconds_per_char: float = 0.01, chunk_chars: int = 64):
+        self.latency = latency
+        self.modules = modules
+        self.seconds_per_char = seconds_per_char
+        self.chunk_chars = chunk_chars
+
+    def answer(self, contents, config) -> types.GenerateContentResponse:
+        prompt = content_text(contents)
+        prompt_tokens = len(prompt) // 4 + 1
+        config = types.GenerateContentConfig.model_validate(config) if isinstance(config, dict) else config
+
+        if config is not None and config.response_mime_type and config.response_mime_type.startswith("audio/"):
+            audio = make_wav(len(prompt) * self.seconds_per_char)
+            return make_response([types.Part(inline_data=types.Blob(mime_type="audio/wav", data=audio))], prompt_tokens)
+
+        if config is not None and config.tools:
+            if len(contents) > 1:
+                return make_response([types.Part(text="I found enough books for the curriculum.")], prompt_tokens)
+            topic = prompt.split(".")[0]
+            return make_response([
+                types.Part(function_call=types.FunctionCall(name="hybrid_search", args={"user_content": topic})),
+                types.Part(function_call=types.FunctionCall(name="semantic_search", args={"user_content": f"learn {topic}"})),
+                types.Part(function_call=types.FunctionCall(name="vector_similarity_search", args={"query": topic})),
+            ], prompt_tokens)
+
+        if config is not None and config.response_schema:
+            match = re.search(r"learn about the topic: (.+?)\. The curriculum", prompt)
+            curriculum = make_curriculum(self.modules, match.group(1) if match else "Python Programming")
+            return make_response([types.Part(text=json.dumps(curriculum))], prompt_tokens, parsed=curriculum)
+
+        title = prompt.rsplit("curriculum: ", 1)[-1].split("\n")[0][:80]
+        return make_response([types.Part(text=f"Discover {title}, a guided path built from the best books. Start today and learn at your own pace.\n")], prompt_tokens)
+
+    async def generate_content(self, model, contents, config=None):
+        await self.latency.wait()
+        return self.answer(contents, config)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        await self.latency.wait()
+        for chunk in self.chunks(self.answer(contents, config)):
+            await asyncio.sleep(0)
+            yield chunk
+
+    def chunks(self, response: types.GenerateContentResponse):
+        text = response.text or ""
+        for start in range(0, len(text), self.chunk_chars):
+            last = start + self.chunk_chars >= len(text)
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text[start:start + self.chunk_chars])]))],
+                usage_metadata=response.usage_metadata if last else None,
+            )
+
+class FakeSyncGeminiModels:
+    """
+    client.models of a FakeGenaiClient, the blocking stream the functions
+    read on the executor.
+    """
+
+    def __init__(self, models: FakeGeminiModels):
+        self.models = models
+
+    def generate_content_stream(self, model, contents, config=None):
+        self.models.latency.wait_sync()
+        yield from self.models.chunks(self.models.answer(contents, config))
+
+class FakeGenaiClient:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, modules: int = 8):
+        self.latency = FakeLatency(latency, jitter, error_rate)
+        self.aio = SimpleNamespace(models=FakeGeminiModels(self.latency, modules=modules))
+        self.models = FakeSyncGeminiModels(self.aio.models)
+
+class FakeGeminiServer:
+    """
+    Gemini behind a requests/tokens quota over a sliding window.
+    """
+
+    def __init__(self, requests_per_window: int, tokens_per_window: int, window: float, latency: float):
+        self.requests_per_window = requests_per_window
+        self.tokens_per_window = tokens_per_window
+        self.window = window
+        self.latency = latency
+        self.calls = 0
+        self.rejected = 0
+        self._history: deque[tuple[float, int]] = deque()
+
+    async def generate_content(self, prompt: str):
+        from src.functions.gemini_rate_limit import estimate_tokens
+
+        self.calls += 1
+        now = time.monotonic()
+        while self._history and self._history[0][0] < now - self.window:
+            self._history.popleft()
+        tokens = estimate_tokens(prompt) + 100
+        used_tokens = sum(used for _, used in self._history)
+        if len(self._history) >= self.requests_per_window or used_tokens + tokens > self.tokens_per_window:
+            self.rejected += 1
+            raise FakeQuotaError()
+        self._history.append((now, tokens))
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(usage_metadata=SimpleNamespace(total_token_count=tokens))
+
+def install_fakes(weaviate: FakeWeaviateClient, genai: FakeGenaiClient):
+    """
+    Make the worker's Weaviate pool and GenAI client use the fakes.
+    """
+    from src.functions import genai_client
+    from src.functions.weaviate_pool import weaviate_pool
+
+    async def connect():
+        return weaviate
+    weaviate_pool.connect = connect
+    genai_client._client = genai
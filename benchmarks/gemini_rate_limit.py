@@ -0,0 +1,88 @@
+"""
+Throughput benchmark for the Gemini rate limiter.
+
+A fake Gemini server enforces a requests/tokens quota over a sliding window and
+answers 429 RESOURCE_EXHAUSTED when it is exceeded. The window is shortened
+(--window seconds instead of a minute) so a run takes a few seconds. Three
+strategies send the same workload:
+
+- fixed: the old ServiceOptions(rate_limit=0.16) pacing, scaled to the window
+- unthrottled: fire as fast as possible, no retries
+- adaptive: GeminiRateLimiter with backoff and request coalescing
+
+    python -m benchmarks.gemini_rate_limit --requests 60 --rpm 15 --window 1
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from restack_ai.observability import logger
+from benchmarks.fakes import FakeGeminiServer, FakeQuotaError
+from src.functions.gemini_rate_limit import GeminiRateLimiter, estimate_tokens
+
+def make_prompts(count: int) -> list[str]:
+    # Every third prompt repeats an earlier one, like identical summary prompts
+    return [f"Curriculum prompt {i if i % 3 else max(0, i - 1)} " + "lorem ipsum " * 50 for i in range(count)]
+
+async def run_fixed(server, prompts, window):
+    # rate_limit=0.16 is 9.6 requests per minute, i.e. per window here
+    interval = window / (0.16 * 60)
+    errors = 0
+    for prompt in prompts:
+        try:
+            await server.generate_content(prompt)
+        except FakeQuotaError:
+            errors += 1
+        await asyncio.sleep(interval)
+    return errors
+
+async def run_unthrottled(server, prompts):
+    results = await asyncio.gather(*(server.generate_content(p) for p in prompts), return_exceptions=True)
+    return sum(1 for result in results if isinstance(result, Exception))
+
+async def run_adaptive(server, prompts, rpm, tpm, window):
+    limiter = GeminiRateLimiter(rpm, tpm, base_backoff=window / 10, max_backoff=window, period=window)
+
+    async def call(prompt):
+        return await limiter.coalesce(
+            prompt,
+            lambda: limiter.call(lambda: server.generate_content(prompt), estimate_tokens(prompt) + 100),
+        )
+
+    results = await asyncio.gather(*(call(p) for p in prompts), return_exceptions=True)
+    print(f"  limiter stats: {limiter.stats().model_dump()}")
+    return sum(1 for result in results if isinstance(result, Exception))
+
+async def run(args):
+    prompts = make_prompts(args.requests)
+    for name in ("fixed", "unthrottled", "adaptive"):
+        server = FakeGeminiServer(args.rpm, args.tpm, args.window, args.latency)
+        start = time.perf_counter()
+        if name == "fixed":
+            errors = await run_fixed(server, prompts, args.window)
+        elif name == "unthrottled":
+            errors = await run_unthrottled(server, prompts)
+        else:
+            errors = await run_adaptive(server, prompts, args.rpm, args.tpm, args.window)
+        elapsed = time.perf_counter() - start
+        completed = len(prompts) - errors
+        print(
+            f"{name:12s} completed={completed:4d} caller_errors={errors:4d} "
+            f"upstream_429={server.rejected:4d} upstream_calls={server.calls:4d} "
+            f"elapsed={elapsed:6.2f}s throughput={completed / elapsed:6.1f}/s"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--rpm", type=int, default=15, help="Requests allowed per window")
+    parser.add_argument("--tpm", type=int, default=1_000_000, help="Tokens allowed per window")
+    parser.add_argument("--window", type=float, default=1.0, help="Quota window in seconds (a minute in production)")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    logger.setLevel(logging.ERROR)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
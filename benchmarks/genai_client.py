@@ -0,0 +1,117 @@
+"""
+Latency benchmark for per-call vs shared GenAI clients.
+
+A local HTTP server answers generateContent like Gemini does. Opening a
+connection costs --connect-delay seconds, standing in for the TCP + TLS
+handshake to the real endpoint, and every answer takes --latency seconds. Two
+strategies send the same calls:
+
+- per_call: genai.Client(...) built for every call, as the functions used to
+- shared: one client from build_genai_client over a pooled keep-alive session
+
+    python -m benchmarks.genai_client --calls 100 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google import genai
+from restack_ai.observability import logger
+from src.functions.genai_client import build_genai_client, build_session
+
+RESPONSE = json.dumps({
+    "candidates": [{"content": {"role": "model", "parts": [{"text": "ok"}]}}],
+    "usageMetadata": {"totalTokenCount": 10},
+}).encode()
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in two writes, Nagle would hold the second one on kept-alive connections
+    disable_nagle_algorithm = True
+    connect_delay = 0.0
+    latency = 0.0
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        time.sleep(self.connect_delay)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+def start_server(connect_delay: float, latency: float) -> ThreadingHTTPServer:
+    handler = type("Handler", (FakeGeminiHandler,), {"connect_delay": connect_delay, "latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def percentile(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+async def run_calls(make_client, calls: int, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def call(i):
+        async with semaphore:
+            start = time.perf_counter()
+            client = make_client()
+            await client.aio.models.generate_content(model="gemini-1.5-flash", contents=[f"prompt {i}"])
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(call(i) for i in range(calls)))
+    return latencies
+
+async def run(args):
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    for name in ("per_call", "shared"):
+        server = start_server(args.connect_delay, args.latency)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        if name == "per_call":
+            make_client = lambda: genai.Client(
+                api_key=os.environ["GEMINI_API_KEY"],
+                http_options={"base_url": base_url},
+            )
+            session = None
+        else:
+            session = build_session(pool_size=args.concurrency)
+            shared = build_genai_client(session, base_url=base_url)
+            make_client = lambda: shared
+        latencies = await run_calls(make_client, args.calls, args.concurrency)
+        if session is not None:
+            session.close()
+        server.shutdown()
+        print(
+            f"{name:10s} calls={len(latencies):4d} connections={server.connections:4d} "
+            f"p50={percentile(latencies, 50) * 1000:7.1f}ms p99={percentile(latencies, 99) * 1000:7.1f}ms"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--connect-delay", type=float, default=0.03, help="Seconds to open a connection")
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds to answer a request")
+    args = parser.parse_args()
+    logger.setLevel(logging.ERROR)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Workflow history size of the Gemini steps of one CurriculumWorkflow run.
+
+Without arguments, builds representative Gemini responses (a tool call round,
+a structured curriculum, a summary) and compares what a run stores in its
+history when steps return the full response (before) and GeminiOutput
+(after). Both step results and the summary prompt, which embeds the
+curriculum, are counted.
+
+With --workflow-id, fetches the history of a finished run from Temporal and
+reports its size per event type.
+
+    python -m benchmarks.history_size --modules 8
+    python -m benchmarks.history_size --workflow-id <temporal workflow id>
+"""
+import argparse
+import asyncio
+import json
+from collections import Counter
+
+from google.genai import types
+from benchmarks.fakes import make_curriculum, make_response
+from src.functions.gemini_function_call import FunctionInputParams, compact_response
+
+def payload_size(value) -> int:
+    if hasattr(value, "model_dump_json"):
+        return len(value.model_dump_json().encode())
+    return len(json.dumps(value).encode())
+
+def synthetic(args):
+    tool_round = make_response([
+        types.Part(function_call=types.FunctionCall(name=name, args={"user_content": query}))
+        for name, query in (("hybrid_search", "python for beginners"), ("semantic_search", "learn python programming"))
+    ], prompt_tokens=400)
+    curriculum = make_curriculum(args.modules)
+    generated = make_response([types.Part(text=json.dumps(curriculum))], prompt_tokens=900, parsed=curriculum)
+    summary = make_response([types.Part(text="Learn Python from scratch in a guided path. Start today and build real projects.\n")], prompt_tokens=1500)
+
+    # The workflow's Gemini steps: tool rounds, curriculum, summary
+    responses = [tool_round] * args.tool_rounds + [generated, summary]
+    before_results = sum(payload_size(response.model_dump(mode="json", exclude_none=True)) for response in responses)
+    after_results = sum(payload_size(compact_response(response)) for response in responses)
+
+    prompt = "Make a two-sentence summary for an audio ad of the following curriculum: "
+    before_prompt = payload_size(FunctionInputParams(user_content=prompt + json.dumps(generated.model_dump(mode="json", exclude_none=True))))
+    after_prompt = payload_size(FunctionInputParams(user_content=prompt + json.dumps(compact_response(generated).parsed)))
+
+    print(f"{'':16s} {'before':>10s} {'after':>10s}")
+    print(f"{'step results':16s} {before_results:10d} {after_results:10d}")
+    print(f"{'summary prompt':16s} {before_prompt:10d} {after_prompt:10d}")
+    total_before, total_after = before_results + before_prompt, after_results + after_prompt
+    print(f"{'total bytes':16s} {total_before:10d} {total_after:10d}  ({1 - total_after / total_before:.0%} smaller)")
+
+async def measure_history(workflow_id: str):
+    from src.client import client
+
+    await client.connect()
+    history = await client.client.get_workflow_handle(workflow_id).fetch_history()
+    sizes, counts = Counter(), Counter()
+    for event in history.events:
+        name = event.WhichOneof("attributes")
+        sizes[name] += event.ByteSize()
+        counts[name] += 1
+    for name, size in sizes.most_common():
+        print(f"{name:60s} {counts[name]:4d} events {size:10d} bytes")
+    print(f"{'total':60s} {len(history.events):4d} events {sum(sizes.values()):10d} bytes")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflow-id", help="Measure the history of this Temporal workflow instead")
+    parser.add_argument("--modules", type=int, default=8, help="Modules in the synthetic curriculum")
+    parser.add_argument("--tool-rounds", type=int, default=2)
+    args = parser.parse_args()
+    if args.workflow_id:
+        asyncio.run(measure_history(args.workflow_id))
+    else:
+        synthetic(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare the local hybrid search with Weaviate's hybrid query.
+
+For every query both backends return their top k books. recall@k is the share
+of Weaviate's books the local engine also returns, averaged over queries, and
+latency is reported per backend. Build the local index first with
+`poetry run sync-index`. --offline skips Weaviate and only times the local
+engine.
+
+    python -m benchmarks.hybrid_recall --k 2 --alpha 0.5
+    python -m benchmarks.hybrid_recall --queries queries.txt --k 10
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from restack_ai.observability import logger
+from src.functions.embeddings import get_embedder
+from src.functions.local_hybrid import HybridIndex
+from src.functions.local_index import LOCAL_INDEX_DIR, LocalIndex
+from src.functions.weaviate_functions import HYBRID_ALPHA, SEARCH_LIMIT
+from src.sync_index import COLLECTION
+
+SAMPLE_QUERIES = [
+    "learn python programming",
+    "introduction to machine learning",
+    "history of ancient rome",
+    "french cooking for beginners",
+    "quantum physics explained",
+    "personal finance and investing",
+    "science fiction space opera",
+    "philosophy of mind",
+    "gardening and growing vegetables",
+    "world war two memoir",
+]
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+def local_results(index: LocalIndex, queries: list[str], alpha: float, k: int) -> tuple[list[list[str]], list[float]]:
+    hybrid = HybridIndex(index)
+    embedder = get_embedder(index.embedder)
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        vector = embedder.embed([query])[0]
+        books = hybrid.search(query, vector, alpha, k)
+        latencies.append(time.perf_counter() - start)
+        results.append([obj["title"] for obj, _ in books])
+    return results, latencies
+
+async def weaviate_results(queries: list[str], alpha: float, k: int) -> tuple[list[list[str]], list[float]]:
+    from src.functions.weaviate_pool import connect_weaviate
+
+    client = await connect_weaviate()
+    try:
+        collection = client.collections.get(COLLECTION)
+        results, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            response = await collection.query.hybrid(query=query, alpha=alpha, limit=k)
+            latencies.append(time.perf_counter() - start)
+            results.append([obj.properties.get("title") for obj in response.objects])
+        return results, latencies
+    finally:
+        await client.close()
+
+def recall_at_k(local: list[list[str]], reference: list[list[str]]) -> float:
+    recalls = [len(set(mine) & set(theirs)) / len(theirs) for mine, theirs in zip(local, reference) if theirs]
+    return sum(recalls) / len(recalls) if recalls else 0.0
+
+def report(name: str, latencies: list[float]):
+    print(
+        f"{name:9s} queries={len(latencies):4d} "
+        f"p50={percentile(latencies, 50) * 1000:8.2f}ms p99={percentile(latencies, 99) * 1000:8.2f}ms"
+    )
+
+async def run(args):
+    queries = SAMPLE_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as queries_file:
+            queries = [line.strip() for line in queries_file if line.strip()]
+
+    index = LocalIndex.load(args.index_dir)
+    print(f"Local index: {len(index)} objects, embedder {index.embedder}")
+    local, local_latencies = local_results(index, queries, args.alpha, args.k)
+    report("local", local_latencies)
+    if args.offline:
+        return
+
+    reference, weaviate_latencies = await weaviate_results(queries, args.alpha, args.k)
+    report("weaviate", weaviate_latencies)
+    print(f"recall@{args.k}={recall_at_k(local, reference):.3f}")
+    if args.verbose:
+        for query, mine, theirs in zip(queries, local, reference):
+            print(f"  {query!r}\n    local:    {mine}\n    weaviate: {theirs}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", help="File with one query per line")
+    parser.add_argument("--k", type=int, default=SEARCH_LIMIT)
+    parser.add_argument("--alpha", type=float, default=HYBRID_ALPHA)
+    parser.add_argument("--index-dir", default=LOCAL_INDEX_DIR)
+    parser.add_argument("--offline", action="store_true", help="Only time the local engine")
+    parser.add_argument("--verbose", action="store_true", help="Print both result lists per query")
+    args = parser.parse_args()
+    logger.setLevel(logging.ERROR)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
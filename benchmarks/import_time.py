@@ -0,0 +1,124 @@
+"""
+Import time of the services, per module.
+
+Every target runs --runs times in a fresh interpreter under
+`python -X importtime`, the way the launcher spawns a worker and `poetry run
+dev` restarts the services on every file change:
+
+    services         import src.services
+    worker:<queue>   a worker of one queue: its workflows and functions, and
+                     the SDKs they import on first use
+    dev              every queue in one process, what a dev reload re-runs
+
+The first run of a target is its cold start (the OS file cache may still be
+cold after a checkout or deploy), the median of the others is what a restart
+or hot reload costs. Ready is the median time until the worker can start
+polling, the services import the SDKs in the background after that. For
+--profile, the modules with the highest cumulative and self import time are
+listed.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 7 --profile worker:search --top 30
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from src.queues import TASK_QUEUES
+
+def target_code(target: str) -> str:
+    """
+    Code run for target. It prints when the worker could start polling
+    (ready) and when the SDKs its queues use are loaded too.
+    """
+    queues = [] if target == "services" else TASK_QUEUES if target == "dev" else [target.split(":", 1)[1]]
+    return (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        "import importlib, src.services as services\n"
+        f"queues = {queues!r}\n"
+        "for queue in queues:\n"
+        "    services.queue_definitions(queue)\n"
+        "print('ready', time.perf_counter() - start)\n"
+        "for queue in queues:\n"
+        "    for module in services.QUEUE_SDKS.get(queue, []):\n"
+        "        importlib.import_module(module)\n"
+    )
+
+def run_target(target: str) -> tuple[float, float, str]:
+    """
+    Wall time of a fresh interpreter running target, the seconds until it was
+    ready, and its -X importtime report.
+    """
+    # Settings of the lazily created clients, nothing connects while importing
+    env = {**os.environ, "PYTHONPATH": os.getcwd(), "METRICS_PORT": "0", "METRICS_FILE": ""}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", target_code(target)],
+        env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{target} failed:\n{result.stderr[-2000:]}")
+    ready = float(result.stdout.split("ready", 1)[1].split()[0])
+    return elapsed, ready, result.stderr
+
+def parse_importtime(report: str) -> list[tuple[str, int, int]]:
+    """
+    (module, self µs, cumulative µs) for every line of an -X importtime report.
+    """
+    modules = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+def print_profile(target: str, report: str, top: int):
+    modules = parse_importtime(report)
+    total = sum(self_us for _, self_us, _ in modules)
+    print(f"\n{target}: {len(modules)} modules, {total / 1000:.1f}ms importing")
+    for title, column in (("cumulative", 2), ("self", 1)):
+        print(f"\nTop {top} by {title} time")
+        print(f"{'module':<60} {'self ms':>9} {'cum ms':>9}")
+        for name, self_us, cumulative_us in sorted(modules, key=lambda module: module[column], reverse=True)[:top]:
+            print(f"{name[:60]:<60} {self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    targets = ["services", *(f"worker:{queue}" for queue in TASK_QUEUES), "dev"]
+    parser.add_argument("--targets", default=",".join(targets), help="Comma separated targets")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--profile", default="dev", help="Target to list the slowest modules of, '' for none")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    selected = [target for target in args.targets.split(",") if target]
+    unknown = set(selected + ([args.profile] if args.profile else [])) - set(targets)
+    if unknown:
+        parser.error(f"unknown targets {', '.join(sorted(unknown))}, expected {', '.join(targets)}")
+
+    print(f"{'target':<16} {'cold ms':>9} {'reload ms':>10} {'ready ms':>9} {'modules':>8}")
+    reports = {}
+    for target in selected:
+        timings, ready = [], []
+        for _ in range(max(1, args.runs)):
+            elapsed, until_ready, report = run_target(target)
+            timings.append(elapsed)
+            ready.append(until_ready)
+        reports[target] = report
+        reload = statistics.median(timings[1:]) if len(timings) > 1 else timings[0]
+        print(
+            f"{target:<16} {timings[0] * 1000:>9.0f} {reload * 1000:>10.0f} "
+            f"{statistics.median(ready) * 1000:>9.0f} {len(parse_importtime(report)):>8}"
+        )
+
+    if args.profile:
+        report = reports.get(args.profile) or run_target(args.profile)[2]
+        print_profile(args.profile, report, args.top)
+
+if __name__ == "__main__":
+    main()
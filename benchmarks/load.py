@@ -0,0 +1,244 @@
+"""
+Offline load test of the workflows and functions.
+
+Weaviate and Gemini are replaced by the fakes of benchmarks.fakes, with
+configurable latency, jitter and error rate. Workflow steps run in-process
+(workflow.step calls the function directly), so a run measures this code, not
+Temporal. Each scenario is called --requests times, at most --concurrency at
+a time, after a warm-up call (retried when it fails). Reported per scenario:
+p50/p95/p99 latency, throughput and error rate.
+
+Caches and artifacts go to a temporary directory. The response, search and
+embedding caches are off unless --caches is given, and the Gemini rate limit
+is lifted unless --gemini-rpm is given, so runs are comparable between
+commits. Results are written to --output with the commit they were measured
+on; --compare prints the change against an earlier results file.
+
+    python -m benchmarks.load --requests 200 --concurrency 20
+    python -m benchmarks.load --scenario curriculum --weaviate-latency 0.05 --gemini-latency 0.3
+    python -m benchmarks.load --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+SCENARIOS = [
+    "curriculum",
+    "braille_workflow",
+    "hybrid_search",
+    "semantic_search",
+    "vector_similarity_search",
+    "gemini_function_call",
+    "text_to_braille",
+    "text_to_audio",
+]
+
+TOPICS = [
+    "coding with Python", "machine learning", "roman history", "french cooking", "quantum physics",
+    "investing", "astronomy", "philosophy of mind", "gardening", "music theory",
+]
+
+def configure_environment(args, directory: str):
+    """
+    Settings the src modules read when they are imported.
+    """
+    os.environ.update({
+        "SEARCH_BACKEND": "weaviate",
+        "EMBEDDING_MODEL": "hashing",
+        "GEMINI_CACHE_PATH": os.path.join(directory, "gemini_cache.sqlite3"),
+        "GEMINI_RAW_RESPONSE_DIR": os.path.join(directory, "gemini_responses"),
+        "AUDIO_ARTIFACT_DIR": os.path.join(directory, "audio"),
+        "EMBEDDING_CACHE_PATH": os.path.join(directory, "embeddings.sqlite3") if args.caches else "",
+        "GEMINI_CACHE_ENABLED": "true" if args.caches else "false",
+        "SEARCH_CACHE_TTL": os.environ.get("SEARCH_CACHE_TTL", "3600") if args.caches else "0",
+        "GEMINI_REQUESTS_PER_MINUTE": str(args.gemini_rpm or 1e9),
+        "GEMINI_TOKENS_PER_MINUTE": str(args.gemini_tpm or 1e12),
+    })
+
+def topic(index: int, distinct: int) -> str:
+    # distinct topics in total, repeated in turn; 0 makes every request unique
+    index = index % distinct if distinct else index
+    return f"{TOPICS[index % len(TOPICS)]} {index}"
+
+def build_scenarios(args) -> dict:
+    from src.workflows.workflow import BrailleWorkflow, BrailleWorkflowInput, CurriculumInput, CurriculumWorkflow
+    from src.functions.weaviate_functions import QueryInput, hybrid_search, semantic_search
+    from src.functions.vector_similarity_search import VectorSearchInput, vector_similarity_search
+    from src.functions.gemini_function_call import FunctionInputParams, gemini_function_call
+    from src.functions.text_to_braille import BrailleInput, text_to_braille
+    from src.functions.text_to_audio import AudioInput, text_to_audio
+
+    def text(index):
+        return f"Learn {topic(index, args.distinct)} with the best books, one module at a time. " * 3
+
+    return {
+        "curriculum": lambda i: CurriculumWorkflow().run(CurriculumInput(
+            user_content=f"I want to learn about {topic(i, args.distinct)}", stream_curriculum=args.stream
+        )),
+        "braille_workflow": lambda i: BrailleWorkflow().run(BrailleWorkflowInput(text=text(i))),
+        "hybrid_search": lambda i: hybrid_search(QueryInput(user_content=topic(i, args.distinct))),
+        "semantic_search": lambda i: semantic_search(QueryInput(user_content=topic(i, args.distinct))),
+        "vector_similarity_search": lambda i: vector_similarity_search(VectorSearchInput(query=topic(i, args.distinct))),
+        "gemini_function_call": lambda i: gemini_function_call(FunctionInputParams(
+            user_content=f"{topic(i, args.distinct)}. Find books about it.", tools=True
+        )),
+        "text_to_braille": lambda i: text_to_braille(BrailleInput(text=text(i))),
+        "text_to_audio": lambda i: text_to_audio(AudioInput(text=text(i))),
+    }
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+# Warm-up calls tried before giving up on it, when the fakes fail on purpose
+WARMUP_ATTEMPTS = 3
+
+async def run_scenario(call, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors: Counter = Counter()
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call(index)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+
+    # Warm-up: the first call connects the pool and loads the embedder. With
+    # --error-rate it can fail like any call, the run goes on regardless.
+    warmup_errors: Counter = Counter()
+    for _ in range(WARMUP_ATTEMPTS):
+        try:
+            await call(requests)
+            break
+        except Exception as e:
+            warmup_errors[type(e).__name__] += 1
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_rate": sum(errors.values()) / requests,
+        "error_types": dict(errors),
+        "warmup_errors": dict(warmup_errors),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+    }
+    if latencies:
+        result.update({
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "mean_ms": statistics.fmean(latencies) * 1000,
+            "max_ms": max(latencies) * 1000,
+        })
+    return result
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def report(name: str, result: dict):
+    latency = (
+        f"p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms"
+        if "p50_ms" in result else "no successful requests"
+    )
+    warmup = sum(result.get("warmup_errors", {}).values())
+    suffix = f" (warm-up failed {warmup}x)" if warmup else ""
+    print(f"{name:25s} {latency} throughput={result['throughput_rps']:8.1f}/s errors={result['error_rate']:6.1%}{suffix}")
+
+def compare(results: dict, baseline_file: str):
+    with open(baseline_file, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nChange against {baseline_file} (commit {baseline.get('commit', 'unknown')}):")
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in ("p50_ms", "p99_ms", "throughput_rps", "error_rate"):
+            if metric in result and metric in before and before[metric]:
+                changes.append(f"{metric}={result[metric] / before[metric] - 1:+7.1%}")
+        print(f"{name:25s} " + " ".join(changes))
+
+async def run(args) -> dict:
+    from restack_ai.workflow import workflow
+    from benchmarks.fakes import FakeGenaiClient, FakeWeaviateClient, install_fakes, make_books
+
+    # Steps run in this process instead of being scheduled on a worker
+    async def run_step(function, input=None, **options):
+        return await function(input)
+    workflow.step = run_step
+
+    weaviate = FakeWeaviateClient(make_books(args.books), args.weaviate_latency, args.jitter, args.error_rate)
+    genai = FakeGenaiClient(args.gemini_latency, args.jitter, args.error_rate, modules=args.modules)
+    install_fakes(weaviate, genai)
+
+    scenarios = build_scenarios(args)
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        results[name] = await run_scenario(scenarios[name], args.requests, args.concurrency)
+        report(name, results[name])
+    print(f"fake upstream calls: weaviate={weaviate.latency.calls} gemini={genai.latency.calls}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run, repeatable (default: all)")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--distinct", type=int, default=0, help="Distinct topics, repeated in turn (0: every request unique)")
+    parser.add_argument("--weaviate-latency", type=float, default=0.02, help="Fake Weaviate latency in seconds")
+    parser.add_argument("--gemini-latency", type=float, default=0.1, help="Fake Gemini latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake upstream calls that fail")
+    parser.add_argument("--books", type=int, default=500, help="Books in the fake collection")
+    parser.add_argument("--modules", type=int, default=8, help="Modules of the fake curricula")
+    parser.add_argument("--stream", action="store_true", help="Stream the curriculum like the workflow default")
+    parser.add_argument("--caches", action="store_true", help="Keep the response, search and embedding caches on")
+    parser.add_argument("--gemini-rpm", type=float, default=0, help="Gemini requests per minute (default: no limit)")
+    parser.add_argument("--gemini-tpm", type=float, default=0, help="Gemini tokens per minute (default: no limit)")
+    parser.add_argument("--output", default="artifacts/load_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare with")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="load-")
+    try:
+        configure_environment(args, directory)
+        from restack_ai.observability import logger
+        logger.setLevel(logging.ERROR)
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": git_commit(),
+            "created": datetime.now(timezone.utc).isoformat(),
+            "config": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Concurrency benchmark for the Weaviate search functions.
+
+Runs N hybrid_search calls in parallel against a fake async Weaviate client with
+a fixed query latency. With non-blocking functions the batch should finish in
+about the latency of a single search.
+
+    python -m benchmarks.search_concurrency --parallel 20 --latency 0.2
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from restack_ai.observability import logger
+
+from benchmarks.fakes import FakeWeaviateClient
+from src.functions.weaviate_pool import weaviate_pool
+from src.functions.weaviate_functions import hybrid_search, QueryInput
+
+async def run(parallel: int, latency: float):
+    async def connect():
+        return FakeWeaviateClient(latency=latency)
+    weaviate_pool.connect = connect
+
+    # Warm up the pool so the connect isn't counted
+    await hybrid_search(QueryInput(user_content="warmup"))
+
+    start = time.perf_counter()
+    await hybrid_search(QueryInput(user_content="single"))
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        hybrid_search(QueryInput(user_content=f"topic {i}")) for i in range(parallel)
+    ))
+    batch = time.perf_counter() - start
+
+    print(f"single search:       {single * 1000:8.1f} ms")
+    print(f"{parallel:3d} parallel searches: {batch * 1000:8.1f} ms ({batch / single:.2f}x single)")
+    print(f"pool stats: {weaviate_pool.stats().model_dump()}")
+    await weaviate_pool.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parallel", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake query latency in seconds")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    asyncio.run(run(args.parallel, args.latency))
+
+if __name__ == "__main__":
+    main()
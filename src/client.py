@@ -1,20 +1,43 @@
 import os
-from restack_ai import Restack
-from restack_ai.restack import CloudConnectionOptions
-from dotenv import load_dotenv  
+from typing import TYPE_CHECKING, Optional
+from dotenv import load_dotenv
 # Load environment variables from a .env file
 load_dotenv()
 
+if TYPE_CHECKING:
+    from restack_ai import Restack
 
 engine_id = os.getenv("RESTACK_ENGINE_ID")
 address = os.getenv("RESTACK_ENGINE_ADDRESS")
 api_key = os.getenv("RESTACK_ENGINE_API_KEY")
 api_address = os.getenv("RESTACK_ENGINE_API_ADDRESS")
 
-connection_options = CloudConnectionOptions(
-    engine_id=engine_id,
-    address=address,
-    api_key=api_key,
-    api_address=api_address
-)
-client = Restack(connection_options)
\ No newline at end of file
+_client: Optional["Restack"] = None
+
+def get_client() -> "Restack":
+    """
+    Restack client of this process, created on first use so that importing
+    this module (e.g. from a function module) stays cheap.
+    """
+    global _client
+    if _client is None:
+        from restack_ai import Restack
+        from restack_ai.restack import CloudConnectionOptions
+        from src.functions.metrics import measured_data_converter
+
+        connection_options = CloudConnectionOptions(
+            engine_id=engine_id,
+            address=address,
+            api_key=api_key,
+            api_address=api_address,
+            # Restack's converter, recording the payload sizes of the functions
+            data_converter=measured_data_converter
+        )
+        _client = Restack(connection_options)
+    return _client
+
+def __getattr__(name: str):
+    # `from src.client import client` still works, and creates the client then
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
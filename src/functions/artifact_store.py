@@ -0,0 +1,114 @@
+import hashlib
+import os
+import stat
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Iterator, Optional
+from restack_ai.function import log
+from src.functions.executor import run_blocking
+
+class ArtifactStore:
+    """
+    Content-addressed file store on local disk.
+
+    An artifact is stored under a key derived from whatever produced it (e.g.
+    the text and voice of an audio summary), so the same input always maps to
+    the same file. Files are written to a temporary name and renamed when
+    complete, so readers never see partial artifacts. When the store grows
+    past max_bytes the least recently used files are removed.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def path(self, artifact_id: str) -> Path:
+        return self.root / artifact_id[:2] / artifact_id
+
+    def get(self, artifact_id: str) -> Optional[Path]:
+        path = self.path(artifact_id)
+        try:
+            # Reads count as use for the LRU eviction. Unlike touch(), utime
+            # doesn't create an empty file if the artifact was just evicted.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    @contextmanager
+    def open_writer(self, artifact_id: str) -> Iterator[BinaryIO]:
+        """
+        Temporary file that becomes the artifact when the block completes.
+        Nothing is stored if the block raises.
+        """
+        path = self.path(artifact_id)
+        artifact_file, temp_path = self._create_temporary(path)
+        try:
+            with artifact_file:
+                yield artifact_file
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._commit(temp_path, path)
+
+    @asynccontextmanager
+    async def open_async_writer(self, artifact_id: str) -> AsyncIterator[BinaryIO]:
+        """
+        open_writer for coroutines: creating, renaming and evicting run on the
+        blocking executor. Write to the file through run_blocking as well.
+        """
+        path = self.path(artifact_id)
+        artifact_file, temp_path = await run_blocking(self._create_temporary, path)
+        try:
+            with artifact_file:
+                yield artifact_file
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        await run_blocking(self._commit, temp_path, path)
+
+    def put(self, artifact_id: str, data: bytes) -> Path:
+        with self.open_writer(artifact_id) as artifact_file:
+            artifact_file.write(data)
+        return self.path(artifact_id)
+
+    def evict(self, keep: Optional[Path] = None):
+        files = []
+        for path in self.root.glob("*/*"):
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                info = path.stat()
+            except FileNotFoundError:
+                # Evicted by another worker process sharing the store
+                continue
+            if stat.S_ISREG(info.st_mode):
+                files.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+            log.info(f"Evicted artifact {path.name}")
+
+    @staticmethod
+    def _create_temporary(path: Path) -> tuple[BinaryIO, str]:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        return os.fdopen(fd, "w+b"), temp_path
+
+    def _commit(self, temp_path: str, path: Path):
+        os.replace(temp_path, path)
+        self.evict(keep=path)
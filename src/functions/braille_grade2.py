@@ -0,0 +1,112 @@
+import functools
+import json
+import re
+from pathlib import Path
+from src.functions.text_to_braille import BRAILLE_MAP, BRAILLE_TABLE, GRADE1_INDICATOR, mark_numbers
+
+TABLES_DIR = Path(__file__).parent / "braille_tables"
+DEFAULT_TABLE = "en-ueb-g2"
+
+CAPITAL = '⠠'
+CAPITAL_WORD = '⠠⠠'
+# A word may follow the grade 1 indicator a number put in front of it
+WORD = re.compile(r"(⠰?)([A-Za-z]+(?:'[A-Za-z]+)*)")
+# Single letters standing alone, other than these, would read as wordsigns
+PLAIN_SINGLE_LETTERS = "aio"
+
+class ContractionTable:
+    """
+    Grade 2 contraction table compiled into a trie.
+
+    Whole words are looked up in the wordsigns dict. Inside a word the trie
+    finds the longest groupsign at each position, so translating a word costs
+    at most (word length x longest groupsign) steps. Results are memoized per word.
+    """
+
+    def __init__(self, wordsigns: dict, groupsigns: dict, not_initial=(), not_final=()):
+        self.wordsigns = wordsigns
+        self.trie: dict = {}
+        for letters, sign in groupsigns.items():
+            node = self.trie
+            for letter in letters:
+                node = node.setdefault(letter, {})
+            node["$"] = (sign, letters in not_initial, letters in not_final)
+        # Natural text repeats the same words, so most lookups skip the trie walk
+        self.contract_word = functools.lru_cache(maxsize=65536)(self._contract_word)
+
+    def _contract_word(self, word: str) -> str:
+        lower = word.lower()
+        if len(word) > 1 and word.isupper():
+            prefix, mixed_case = CAPITAL_WORD, False
+        elif word[0].isupper() and (len(word) == 1 or word[1:].islower()):
+            prefix, mixed_case = CAPITAL, False
+        else:
+            prefix, mixed_case = "", not word.islower()
+
+        if len(lower) == 1:
+            indicator = "" if lower in PLAIN_SINGLE_LETTERS else GRADE1_INDICATOR
+            return indicator + prefix + BRAILLE_MAP[lower]
+
+        sign = self.wordsigns.get(lower)
+        if sign is not None and not mixed_case:
+            return prefix + sign
+
+        cells = []
+        position, length = 0, len(lower)
+        while position < length:
+            match = None
+            node, end = self.trie, position
+            while end < length and lower[end] in node:
+                # In mixed-case words a contraction can't span a capital letter
+                if mixed_case and end > position and word[end].isupper():
+                    break
+                node = node[lower[end]]
+                end += 1
+                entry = node.get("$")
+                if entry is None:
+                    continue
+                sign, not_initial, not_final = entry
+                if (not_initial and position == 0) or (not_final and end == length):
+                    continue
+                match = (sign, end)
+
+            if mixed_case and word[position].isupper():
+                cells.append(CAPITAL)
+            if match is not None:
+                cells.append(match[0])
+                position = match[1]
+            else:
+                cells.append(BRAILLE_MAP[lower[position]])
+                position += 1
+        return prefix + "".join(cells)
+
+@functools.lru_cache(maxsize=None)
+def load_contraction_table(name: str = DEFAULT_TABLE) -> ContractionTable:
+    """
+    Load and compile a contraction table from braille_tables/, once per process.
+    """
+    with open(TABLES_DIR / f"{name}.json", encoding="utf-8") as table_file:
+        data = json.load(table_file)
+    return ContractionTable(
+        wordsigns=data["wordsigns"],
+        groupsigns=data["groupsigns"],
+        not_initial=frozenset(data.get("not_initial", [])),
+        not_final=frozenset(data.get("not_final", [])),
+    )
+
+def translate_grade2(text: str, table_name: str = DEFAULT_TABLE) -> str:
+    """
+    Contracted translation: number indicators first (they look at the next
+    letter), then words through the contraction table, then everything else.
+    """
+    table = load_contraction_table(table_name)
+    text = mark_numbers(text)
+    text = WORD.sub(lambda match: _translate_word(table, match), text)
+    return text.translate(BRAILLE_TABLE)
+
+def _translate_word(table: ContractionTable, match: re.Match) -> str:
+    indicator, word = match.groups()
+    if indicator:
+        # Letters right after a number are spelled out uncontracted
+        return indicator + word.translate(BRAILLE_TABLE)
+    return table.contract_word(word)
@@ -0,0 +1,80 @@
+import json
+from typing import Optional
+from restack_ai.function import function_info, heartbeat, log
+from src.client import get_client
+
+class ModuleStreamParser:
+    """
+    Incremental parser for a streamed curriculum_schema JSON document.
+
+    Feed it text chunks as they arrive. It returns every object of the
+    top-level "modules" array as soon as its closing brace has been received,
+    without re-scanning text it has already seen.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._modules_depth: Optional[int] = None
+        self._module_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> list[dict]:
+        self.text += chunk
+        modules = []
+        text = self.text
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:index]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._last_key == "modules":
+                    self._modules_depth = self._depth + 1
+                elif char == "{" and self._depth == self._modules_depth:
+                    self._module_start = index
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._depth == self._modules_depth and self._module_start is not None:
+                    modules.append(json.loads(text[self._module_start:index + 1]))
+                    self._module_start = None
+                elif char == "]" and self._modules_depth is not None and self._depth == self._modules_depth - 1:
+                    self._modules_depth = None
+        self._position = len(text)
+        return modules
+
+async def publish_module(module: dict, index: int):
+    """
+    Report a completed curriculum module to the workflow that started this function.
+    """
+    try:
+        heartbeat({"modules_completed": index + 1})
+        info = function_info()
+    except RuntimeError:
+        # Not running as a workflow step (e.g. called directly), nothing to notify
+        return
+
+    try:
+        client = get_client()
+        await client.connect()
+        handle = client.client.get_workflow_handle(info.workflow_id, run_id=info.workflow_run_id)
+        await handle.execute_update("curriculum_module", module)
+    except Exception as e:
+        # Progress is best effort, the full curriculum is still returned at the end
+        log.warning("Failed to publish curriculum module", error=e)
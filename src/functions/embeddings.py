@@ -0,0 +1,264 @@
+import asyncio
+import functools
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from src.functions.executor import run_blocking
+from src.functions.metrics import metrics
+
+# Model behind the vectors Weaviate Embeddings stores for the book collection
+WEAVIATE_VECTOR_MODEL = "Snowflake/snowflake-arctic-embed-m-v1.5"
+HASHING_EMBEDDER = "hashing"
+DEFAULT_EMBEDDER = os.environ.get("EMBEDDING_MODEL", WEAVIATE_VECTOR_MODEL)
+# Query embeddings kept in memory, in front of the on-disk cache
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "artifacts/embeddings.sqlite3")
+# Texts sent to the model at once
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+class Embedder(ABC):
+    """
+    Turns texts into unit length float32 vectors, one row per text, so a dot
+    product is the cosine similarity.
+    """
+
+    name: str
+    dimensions: int
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> np.ndarray:
+        ...
+
+    def embed_queries(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed search queries, for models that encode them differently from documents.
+        """
+        return self.embed(texts)
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic embedder that needs no model: words and their character
+    trigrams are hashed into a fixed number of signed buckets. Texts sharing
+    words end up close, which is enough to run and test search offline.
+    """
+
+    name = HASHING_EMBEDDER
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        return normalize_rows(vectors)
+
+    @staticmethod
+    def _features(text: str):
+        for word in TOKEN.findall(text.lower()):
+            yield word
+            padded = f"<{word}>"
+            for start in range(len(padded) - 2):
+                yield padded[start:start + 3]
+
+class SentenceTransformerEmbedder(Embedder):
+    """
+    Local CPU model through sentence-transformers (optional dependency).
+    """
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                f"Embedding with {model_name} needs sentence-transformers, "
+                f"install it (poetry install --extras embeddings) or use EMBEDDING_MODEL={HASHING_EMBEDDER}"
+            ) from e
+        self.name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: list[str], prompt_name: Optional[str] = None) -> np.ndarray:
+        vectors = self.model.encode(texts, prompt_name=prompt_name, convert_to_numpy=True, normalize_embeddings=True)
+        return vectors.astype(np.float32, copy=False)
+
+    def embed_queries(self, texts: list[str]) -> np.ndarray:
+        # arctic-embed and similar models expect a query prefix, shipped as the "query" prompt
+        return self.embed(texts, prompt_name="query" if "query" in self.model.prompts else None)
+
+@functools.lru_cache(maxsize=None)
+def get_embedder(name: str = DEFAULT_EMBEDDER) -> Embedder:
+    """
+    Embedder for a model name, loaded once per process.
+    """
+    if name == HASHING_EMBEDDER:
+        return HashingEmbedder()
+    return SentenceTransformerEmbedder(name)
+
+class EmbeddingCache:
+    """
+    Vectors keyed by model and text hash: an in-memory LRU in front of a
+    SQLite table, so repeated queries skip the model even after a restart.
+    Used from executor threads, every access holds a lock.
+    """
+
+    def __init__(self, path: Optional[str] = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        # Counted per distinct key, a text repeated in one call is one lookup
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for key in unique:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            missing = [key for key in unique if key not in found]
+            if missing and self.path:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._connect().execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(key, found[key])
+                self.disk_hits += len(rows)
+            self.hits += len(unique) - len(missing)
+            self.misses += len([key for key in missing if key not in found])
+        return found
+
+    def set_many(self, vectors: dict[str, np.ndarray]):
+        with self._lock:
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            if self.path:
+                connection = self._connect()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()],
+                )
+                connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        return self._connection
+
+embedding_cache = EmbeddingCache()
+metrics.register_stats("embedding_cache", lambda: {
+    "hits": embedding_cache.hits, "disk_hits": embedding_cache.disk_hits, "misses": embedding_cache.misses,
+})
+
+class CachedQueryEmbedder:
+    """
+    Query embeddings through the cache. Only texts that miss it reach the
+    model, deduplicated and in batches of batch_size. The model is loaded on
+    the first miss.
+    """
+
+    def __init__(self, name: str, cache: EmbeddingCache, batch_size: int = EMBED_BATCH_SIZE):
+        self.name = name
+        self.cache = cache
+        self.batch_size = batch_size
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        keys = [self.cache.make_key(self.name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            embedder = get_embedder(self.name)
+            missing_keys, missing_texts = list(missing), list(missing.values())
+            fresh = {}
+            for start in range(0, len(missing_texts), self.batch_size):
+                batch = embedder.embed_queries(missing_texts[start:start + self.batch_size])
+                fresh.update(zip(missing_keys[start:start + self.batch_size], batch))
+            self.cache.set_many(fresh)
+            vectors.update(fresh)
+        return np.stack([vectors[key] for key in keys])
+
+class EmbeddingBatcher:
+    """
+    Gathers the queries submitted during one turn of the event loop (e.g. the
+    concurrent searches of a batch function) into a single blocking embed call.
+    """
+
+    def __init__(self, embedder: CachedQueryEmbedder):
+        self.embedder = embedder
+        self._pending: list[tuple[str, asyncio.Future]] = []
+
+    async def embed(self, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) == 1:
+            loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        batch, self._pending = self._pending, []
+        asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]):
+        try:
+            vectors = await run_blocking(self.embedder.embed, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+@functools.lru_cache(maxsize=None)
+def get_query_embedder(name: str = DEFAULT_EMBEDDER) -> EmbeddingBatcher:
+    return EmbeddingBatcher(CachedQueryEmbedder(name, embedding_cache))
+
+async def embed_query(text: str, name: str = DEFAULT_EMBEDDER) -> np.ndarray:
+    """
+    float32 unit vector for a search query, from the cache when possible.
+    """
+    return await get_query_embedder(name).embed(text)
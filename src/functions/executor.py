@@ -0,0 +1,80 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+# Upper bound on threads used for blocking calls that have no async API
+MAX_BLOCKING_WORKERS = int(os.environ.get("MAX_BLOCKING_WORKERS", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def blocking_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=MAX_BLOCKING_WORKERS,
+            thread_name_prefix="blocking",
+        )
+    return _executor
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a blocking call on the bounded executor so it doesn't stall the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor(), functools.partial(fn, *args, **kwargs))
+
+async def iterate_blocking(fn, *args, **kwargs) -> AsyncIterator:
+    """
+    Iterate the blocking iterator fn(*args, **kwargs) on the bounded executor,
+    yielding its items on the event loop as they arrive. When the consumer
+    stops early, the thread stops after the item it is waiting for.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    end = object()
+
+    def put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # The loop is closed, nobody is waiting anymore
+            stopped.set()
+
+    def produce():
+        iterator = None
+        try:
+            iterator = iter(fn(*args, **kwargs))
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                put(item)
+        except BaseException as e:
+            put(end, e)
+            return
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        put(end)
+
+    loop.run_in_executor(blocking_executor(), produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+def shutdown_blocking_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
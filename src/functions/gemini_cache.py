@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+from pydantic import BaseModel
+from restack_ai.function import log
+
+GEMINI_CACHE_ENABLED = os.environ.get("GEMINI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+GEMINI_CACHE_PATH = os.environ.get("GEMINI_CACHE_PATH", "artifacts/gemini_cache.sqlite3")
+GEMINI_CACHE_TTL = float(os.environ.get("GEMINI_CACHE_TTL", str(7 * 24 * 3600)))
+GEMINI_CACHE_MAX_ENTRIES = int(os.environ.get("GEMINI_CACHE_MAX_ENTRIES", "10000"))
+
+class GeminiCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    saved_latency_seconds: float = 0.0
+    evictions: int = 0
+    invalidations: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+def hash_json(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+class GeminiResponseCache:
+    """
+    Persistent cache of Gemini responses in a local SQLite file.
+
+    Entries expire after ttl seconds and the least recently used ones are
+    dropped above max_entries. The cache is tagged with a schema version (a
+    hash of the tool declarations and response schema): opening it with a
+    different version clears every entry. schema_version is a callable so the
+    hash is taken when the file is first used, after every tool module has
+    registered its declaration.
+    """
+
+    def __init__(self, path: str, schema_version: Callable[[], str], ttl: float = 86400.0, max_entries: int = 10000):
+        self.path = path
+        self.schema_version = schema_version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stats = GeminiCacheStats()
+        # Entries in the file, counted when it is opened and kept up to date by
+        # set(), so stats() never waits for SQLite. Other processes sharing the
+        # file make it drift until the next restart.
+        self._size = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT response, latency FROM responses WHERE key = ? AND created > ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+            if row is None:
+                self._stats.misses += 1
+                return None
+            connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            connection.commit()
+            self._stats.hits += 1
+            self._stats.saved_latency_seconds += row[1]
+            return row[0]
+
+    def set(self, key: str, response: str, latency: float):
+        with self._lock:
+            connection = self._connect()
+            now = time.time()
+            replaced = connection.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, latency, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, latency, now, now),
+            )
+            expired = connection.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,)).rowcount
+            evicted = connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            connection.commit()
+            self._stats.evictions += max(evicted, 0)
+            self._size = max(0, self._size + (not replaced) - max(expired, 0) - max(evicted, 0))
+
+    def invalidate(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM responses")
+            connection.commit()
+            self._stats.invalidations += 1
+            self._size = 0
+
+    def stats(self) -> GeminiCacheStats:
+        """
+        Counters only, without the lock: it is called on the event loop while
+        executor threads may hold the lock for a slow read or write.
+        """
+        stats = self._stats.model_copy()
+        stats.size = self._size
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is not None:
+            return self._connection
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # Used from the blocking executor's threads, always under self._lock
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, latency REAL NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        version = self.schema_version()
+        row = connection.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if row is None or row[0] != version:
+            if row is not None:
+                log.info("Gemini cache schema changed, clearing cached responses")
+                self._stats.invalidations += 1
+            connection.execute("DELETE FROM responses")
+            connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                (version,),
+            )
+        connection.commit()
+        self._size = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        self._connection = connection
+        return connection
@@ -1,38 +1,272 @@
 import os
+import json
+import hashlib
+import time
 from restack_ai.function import function, log
-from pydantic import BaseModel, Field
-from typing import Optional, List
-from google import genai
-from google.genai import types
+from src.functions.metrics import instrument, metrics
+from pydantic import BaseModel, Field, model_validator
+from typing import TYPE_CHECKING, Optional, List
 from src.functions.weaviate_functions import weaviate_tools
+from src.functions.curriculum_stream import ModuleStreamParser, publish_module
+from src.functions.gemini_rate_limit import gemini_limiter, estimate_tokens
+from src.functions.gemini_cache import GeminiResponseCache, hash_json, GEMINI_CACHE_ENABLED, GEMINI_CACHE_PATH, GEMINI_CACHE_TTL, GEMINI_CACHE_MAX_ENTRIES
+from src.functions.executor import iterate_blocking, run_blocking
+from src.functions.genai_client import get_genai_client
+from src.functions.artifact_store import ArtifactStore
+
+if TYPE_CHECKING:
+    # Imported where requests are built, so only Gemini workers load the SDK
+    from google.genai import types
+
+GEMINI_MODEL = 'gemini-1.5-flash'
+# Tokens reserved for the answer until the actual usage is known
+EXPECTED_OUTPUT_TOKENS = 1024
+
+# Full responses, kept only for calls with store_raw_response
+raw_response_store = ArtifactStore(
+    root=os.environ.get("GEMINI_RAW_RESPONSE_DIR", "artifacts/gemini_responses"),
+    max_bytes=int(os.environ.get("GEMINI_RAW_RESPONSE_MAX_BYTES", str(100 * 1024 * 1024))),
+)
+
+class FunctionCall(BaseModel):
+    name: str
+    args: dict = Field(default_factory=dict)
+
+class FunctionResponse(BaseModel):
+    # Name of the function called, and its result or {"error": ...}
+    name: str
+    response: dict = Field(default_factory=dict)
 
 class ChatMessage(BaseModel):
     role: str
-    content: str
+    content: str = ""
+    # Calls made in a model turn, and their results in the user turn after it, in the same order
+    function_calls: List[FunctionCall] = Field(default_factory=list)
+    function_responses: List[FunctionResponse] = Field(default_factory=list)
 
 class FunctionInputParams(BaseModel):
     user_content: str
     tools: bool = False
     structured_output: bool = False
+    # Earlier turns of the conversation, e.g. previous tool rounds
+    messages: Optional[List[ChatMessage]] = None
+    # Results of the function calls of the last model turn in messages, sent along with user_content
+    function_responses: Optional[List[FunctionResponse]] = None
+    # Stream the response and publish curriculum modules as they complete
+    stream: bool = False
+    # Serve identical requests from the on-disk response cache
+    cache: bool = True
+    # Keep the full response in the raw response store, see GeminiOutput.raw_response_id
+    store_raw_response: bool = False
+
+    @model_validator(mode="after")
+    def check_stream(self):
+        # Streamed responses are assembled from their text, function calls would be lost
+        if self.stream and self.tools:
+            raise ValueError("stream and tools can't be combined")
+        return self
+
+class TokenUsage(BaseModel):
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+
+class GeminiOutput(BaseModel):
+    """
+    What the workflows use of a Gemini response. Step results are stored in
+    the workflow history, so the full response stays out of it.
+    """
+    text: str = ""
+    parsed: Optional[dict] = None
+    function_calls: List[FunctionCall] = Field(default_factory=list)
+    usage: TokenUsage = Field(default_factory=TokenUsage)
+    cached: bool = False
+    raw_response_id: Optional[str] = None
+
+def compact_response(response: "types.GenerateContentResponse", cached: bool = False) -> GeminiOutput:
+    texts, function_calls = [], []
+    for index, candidate in enumerate(response.candidates or []):
+        for part in (candidate.content.parts if candidate.content else None) or []:
+            # Only the first candidate's text, like response.text
+            if part.text and index == 0:
+                texts.append(part.text)
+            if part.function_call and part.function_call.name:
+                function_calls.append(FunctionCall(name=part.function_call.name, args=part.function_call.args or {}))
+    usage = response.usage_metadata
+    parsed = response.parsed if isinstance(response.parsed, dict) else None
+    return GeminiOutput(
+        # Structured answers are only kept parsed, their text is the same JSON
+        text="" if parsed is not None else "".join(texts),
+        parsed=parsed,
+        function_calls=function_calls,
+        usage=TokenUsage(
+            prompt_tokens=usage.prompt_token_count or 0,
+            output_tokens=usage.candidates_token_count or 0,
+            total_tokens=usage.total_token_count or 0,
+        ) if usage else TokenUsage(),
+        cached=cached,
+    )
+
+def build_content(message: ChatMessage) -> "types.Content":
+    from google.genai import types
+
+    parts = [
+        types.Part(function_call=types.FunctionCall(name=call.name, args=call.args))
+        for call in message.function_calls
+    ]
+    parts.extend(
+        types.Part(function_response=types.FunctionResponse(name=response.name, response=response.response))
+        for response in message.function_responses
+    )
+    if message.content:
+        parts.append(types.Part(text=message.content))
+    return types.Content(role=message.role, parts=parts)
+
+def build_contents(input: FunctionInputParams):
+    messages = [
+        *(input.messages or []),
+        ChatMessage(role="user", content=input.user_content, function_responses=input.function_responses or []),
+    ]
+    return [build_content(message) for message in messages]
+
+async def stream_content(client, input: FunctionInputParams, config: "types.GenerateContentConfig"):
+    """
+    Stream a response, publishing each curriculum module as soon as it is complete.
+
+    Returns a single response assembled from the streamed chunks, shaped like
+    the non-streaming one.
+    """
+    from google.genai import types
+
+    parser = ModuleStreamParser()
+    published = 0
+    usage_metadata = None
+    # The SDK's async stream reads the server-sent events synchronously on the
+    # event loop, so the sync stream is read on the executor instead
+    async for chunk in iterate_blocking(
+        client.models.generate_content_stream,
+        model=GEMINI_MODEL,
+        contents=build_contents(input),
+        config=config
+    ):
+        usage_metadata = chunk.usage_metadata or usage_metadata
+        if not chunk.text:
+            continue
+        if not input.structured_output:
+            parser.text += chunk.text
+            continue
+        for module in parser.feed(chunk.text):
+            log.info(f"Curriculum module {published + 1} streamed")
+            await publish_module(module, published)
+            published += 1
+
+    response = types.GenerateContentResponse(
+        candidates=[types.Candidate(
+            content=types.Content(role="model", parts=[types.Part(text=parser.text)])
+        )],
+        usage_metadata=usage_metadata
+    )
+    if input.structured_output:
+        try:
+            response.parsed = json.loads(parser.text)
+        except json.JSONDecodeError as e:
+            # Left unparsed like a non-streamed answer, the text is still returned
+            log.warning(f"Streamed Gemini answer is not valid JSON: {e}")
+    return response
+
+def response_cache_key(input: FunctionInputParams) -> str:
+    """
+    Everything that changes the answer: model, conversation, and the tool
+    declarations and response schema when they are sent. The stream flag only
+    changes how the answer is delivered, so it is left out.
+    """
+    return hash_json({
+        "model": GEMINI_MODEL,
+        "messages": [message.model_dump() for message in input.messages or []],
+        "user_content": input.user_content,
+        "function_responses": [response.model_dump() for response in input.function_responses or []],
+        "tools": hash_json(weaviate_tools) if input.tools else None,
+        "response_schema": hash_json(curriculum_schema) if input.structured_output else None,
+    })
+
+async def cached_response(input: FunctionInputParams, cache_key: str):
+    from google.genai import types
+
+    cached = await run_blocking(gemini_cache.get, cache_key)
+    if cached is None:
+        return None
+    data = json.loads(cached)
+    # parsed is typed BaseModel | dict, validating it would drop the dict's content
+    parsed = data.pop("parsed", None)
+    response = types.GenerateContentResponse.model_validate(data)
+    response.parsed = parsed
+    if input.stream and input.structured_output and isinstance(response.parsed, dict):
+        # Progress subscribers still get every module, just all at once
+        for index, module in enumerate(response.parsed.get("modules", [])):
+            await publish_module(module, index)
+    return response
+
+async def get_response(input: FunctionInputParams) -> tuple["types.GenerateContentResponse", bool]:
+    """
+    The response for input, from the cache or from Gemini, and whether it was cached.
+    """
+    cache_key = response_cache_key(input) if GEMINI_CACHE_ENABLED and input.cache else None
+    if cache_key:
+        response = await cached_response(input, cache_key)
+        if response is not None:
+            log.info(f"Gemini response served from cache: {gemini_cache.stats().model_dump()}")
+            return response, True
+
+    from google.genai import types
+
+    client = get_genai_client()
+    
+    config = types.GenerateContentConfig(
+        tools=[types.Tool(
+            function_declarations=weaviate_tools)] if input.tools else None,
+        response_schema=curriculum_schema if input.structured_output else None,
+        response_mime_type="application/json" if input.structured_output else None
+    )
+    prompt_text = input.user_content + "".join(message.content for message in input.messages or [])
+    tokens = estimate_tokens(prompt_text) + EXPECTED_OUTPUT_TOKENS
+    started = time.perf_counter()
+    if input.stream:
+        # Streamed calls publish events to their own workflow, so they are never coalesced
+        response = await gemini_limiter.call(lambda: stream_content(client, input, config), tokens)
+    else:
+        async def generate():
+            return await client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=build_contents(input),
+                config=config
+            )
+
+        # Identical prompts already in flight share one upstream call
+        request_key = hashlib.sha256(input.model_dump_json().encode()).hexdigest()
+        response = await gemini_limiter.coalesce(request_key, lambda: gemini_limiter.call(generate, tokens))
+    latency = time.perf_counter() - started
+    metrics.observe("gemini_request_seconds", latency, stream=input.stream)
+
+    if cache_key and response.candidates:
+        await run_blocking(gemini_cache.set, cache_key, response.model_dump_json(exclude_none=True), latency)
+    log.info(f"Gemini limiter stats: {gemini_limiter.stats().model_dump()}")
+    log.info(f"Gemini cache stats: {gemini_cache.stats().model_dump()}")
+    return response, False
 
 @function.defn()
-async def gemini_function_call(input: FunctionInputParams):
+@instrument
+async def gemini_function_call(input: FunctionInputParams) -> GeminiOutput:
     try:
         log.info("gemini_function_call function started", input=input)
-        client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
-        log.info(f"Client connected to Google GenAI: {client}")
-        
-        response = client.models.generate_content(
-            model='gemini-1.5-flash',
-            contents=[input.user_content],
-            config=types.GenerateContentConfig(
-                tools=[types.Tool(
-                    function_declarations=weaviate_tools)] if input.tools else None,
-                response_schema=curriculum_schema if input.structured_output else None,
-                response_mime_type="application/json" if input.structured_output else None
-            )
-        )
-        return response
+        response, cached = await get_response(input)
+        output = compact_response(response, cached=cached)
+        for kind, tokens in (("prompt", output.usage.prompt_tokens), ("output", output.usage.output_tokens)):
+            metrics.inc("gemini_tokens_total", tokens, kind=kind, cached=cached)
+        if input.store_raw_response:
+            raw = response.model_dump_json(exclude_none=True)
+            output.raw_response_id = ArtifactStore.make_key(raw) + ".json"
+            await run_blocking(raw_response_store.put, output.raw_response_id, raw.encode("utf-8"))
+        return output
     except Exception as e:
         log.error("gemini_function_call function failed", error=e)
         raise e
@@ -83,4 +317,15 @@ curriculum_schema = {
         }
     },
     "required": ["title", "description", "difficulty_level", "estimated_duration", "modules"]
-}
\ No newline at end of file
+}
+
+def schema_version() -> str:
+    return hash_json({"tools": weaviate_tools, "response_schema": curriculum_schema})
+
+gemini_cache = GeminiResponseCache(
+    path=GEMINI_CACHE_PATH,
+    schema_version=schema_version,
+    ttl=GEMINI_CACHE_TTL,
+    max_entries=GEMINI_CACHE_MAX_ENTRIES,
+)
+metrics.register_stats("gemini_cache", gemini_cache.stats)
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable
+from pydantic import BaseModel
+from restack_ai.function import log
+from src.functions.metrics import metrics
+
+class GeminiLimiterStats(BaseModel):
+    requests: int = 0
+    throttled: int = 0
+    coalesced: int = 0
+    rate_scale: float = 1.0
+
+class TokenBucket:
+    """
+    Budget of `capacity` units that refills continuously over `period` seconds.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.period = period
+        self.scale = 1.0
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period * self.scale
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def consume(self, amount: float):
+        """
+        Take (or give back) units without waiting, e.g. to settle an estimate.
+        """
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+def is_quota_error(error: Exception) -> bool:
+    return getattr(error, "code", None) == 429 or getattr(error, "status", None) == "RESOURCE_EXHAUSTED"
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+class GeminiRateLimiter:
+    """
+    Client-side limiter for the Gemini quota.
+
+    Every call waits for both a request and a token budget. A 429 /
+    RESOURCE_EXHAUSTED answer halves the refill rate and the call is retried
+    after an exponential backoff with full jitter. Successful calls bring the
+    rate back up step by step. Identical requests that are already in flight
+    can be coalesced into a single upstream call.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_retries: int = 5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        min_rate_scale: float = 0.1,
+        period: float = 60.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute, period)
+        self.tokens = TokenBucket(tokens_per_minute, period)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.min_rate_scale = min_rate_scale
+        self._stats = GeminiLimiterStats()
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], estimated_tokens: int = 1) -> Any:
+        for attempt in range(self.max_retries + 1):
+            # Time queued behind the quota, apart from the call itself
+            with metrics.timed("gemini_rate_limit_wait_seconds"):
+                await self.requests.acquire()
+                await self.tokens.acquire(estimated_tokens)
+            self._stats.requests += 1
+            try:
+                result = await fn()
+            except Exception as e:
+                if not is_quota_error(e) or attempt == self.max_retries:
+                    raise
+                self._stats.throttled += 1
+                self._set_scale(self.requests.scale / 2)
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                log.warning(f"Gemini quota exhausted, retrying in {delay:.1f}s (attempt {attempt + 1})")
+                await asyncio.sleep(delay)
+                continue
+
+            self._set_scale(self.requests.scale + 0.05)
+            usage = getattr(result, "usage_metadata", None)
+            used_tokens = getattr(usage, "total_token_count", None)
+            if used_tokens:
+                self.tokens.consume(used_tokens - estimated_tokens)
+            return result
+
+    async def coalesce(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `fn` unless an identical request (same key) is already running, in
+        which case wait for its result instead.
+
+        The request runs in its own task, so a caller that is cancelled only
+        stops waiting for it; the others still get the result.
+        """
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._stats.coalesced += 1
+            return await asyncio.shield(in_flight)
+
+        in_flight = asyncio.ensure_future(fn())
+        self._in_flight[key] = in_flight
+        in_flight.add_done_callback(lambda task: self._done(key, task))
+        return await asyncio.shield(in_flight)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved when every caller stopped waiting
+        task.cancelled() or task.exception()
+
+    def stats(self) -> GeminiLimiterStats:
+        stats = self._stats.model_copy()
+        stats.rate_scale = round(self.requests.scale, 3)
+        return stats
+
+    def _set_scale(self, scale: float):
+        scale = min(1.0, max(self.min_rate_scale, scale))
+        self.requests.scale = scale
+        self.tokens.scale = scale
+
+# Defaults match the gemini-1.5-flash free tier, raise them for paid quotas
+GEMINI_REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "15"))
+GEMINI_TOKENS_PER_MINUTE = float(os.environ.get("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+# Worker processes serving the gemini queue, each keeps to its share of the quota
+GEMINI_WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES_GEMINI", "1"))
+
+gemini_limiter = GeminiRateLimiter(
+    requests_per_minute=GEMINI_REQUESTS_PER_MINUTE / GEMINI_WORKER_PROCESSES,
+    tokens_per_minute=GEMINI_TOKENS_PER_MINUTE / GEMINI_WORKER_PROCESSES,
+)
+metrics.register_stats("gemini_limiter", gemini_limiter.stats)
@@ -0,0 +1,109 @@
+import json
+import os
+import types as python_types
+from typing import TYPE_CHECKING, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from restack_ai.function import log
+
+if TYPE_CHECKING:
+    # google.genai is imported when the first client is built, not by every worker
+    from google import genai
+
+# Seconds before a single HTTP request to Gemini is abandoned
+GEMINI_REQUEST_TIMEOUT = float(os.environ.get("GEMINI_REQUEST_TIMEOUT", "120"))
+# Retries for connection errors and 5xx answers, 429s are left to the rate limiter
+GEMINI_HTTP_RETRIES = int(os.environ.get("GEMINI_HTTP_RETRIES", "3"))
+# Keep-alive connections kept open to the Gemini endpoint
+GEMINI_HTTP_POOL_SIZE = int(os.environ.get("GEMINI_HTTP_POOL_SIZE", "16"))
+
+_client: Optional["genai.Client"] = None
+_session: Optional[requests.Session] = None
+
+def build_session(retries: int = GEMINI_HTTP_RETRIES, pool_size: int = GEMINI_HTTP_POOL_SIZE) -> requests.Session:
+    """
+    requests session with a keep-alive connection pool and retries.
+
+    Generation calls have no side effects, so POSTs are retried too.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def use_session(client: "genai.Client", session: requests.Session) -> bool:
+    """
+    Route the client's API key requests through a shared session.
+
+    The pinned SDK opens a new requests.Session (and TLS connection) for every
+    request in ApiClient._request_unauthorized. This replaces that method on
+    the client's ApiClient with the same logic over a pooled session. Returns
+    False, leaving the client untouched, if the SDK doesn't have that hook.
+    Both are SDK internals, which is why google-genai is pinned exactly.
+    """
+    api_client = getattr(client, "_api_client", None)
+    if api_client is None or not hasattr(api_client, "_request_unauthorized"):
+        log.warning("GenAI SDK has no _request_unauthorized hook, requests are not pooled")
+        return False
+    from google.genai import errors
+    from google.genai._api_client import HttpResponse, RequestJsonEncoder
+
+    def request_unauthorized(self, http_request, stream: bool = False):
+        data = http_request.data
+        if data and not isinstance(data, bytes):
+            data = json.dumps(data, cls=RequestJsonEncoder)
+        response = session.request(
+            method=http_request.method,
+            url=http_request.url,
+            headers=http_request.headers,
+            data=data or None,
+            timeout=http_request.timeout,
+            stream=stream,
+        )
+        errors.APIError.raise_for_response(response)
+        return HttpResponse(response.headers, response if stream else [response.text])
+
+    api_client._request_unauthorized = python_types.MethodType(request_unauthorized, api_client)
+    return True
+
+def build_genai_client(
+    session: Optional[requests.Session] = None,
+    timeout: float = GEMINI_REQUEST_TIMEOUT,
+    base_url: Optional[str] = None,
+) -> "genai.Client":
+    from google import genai
+
+    client = genai.Client(
+        api_key=os.environ.get("GEMINI_API_KEY"),
+        http_options={"timeout": timeout, "base_url": base_url},
+    )
+    if session is not None:
+        use_session(client, session)
+    return client
+
+def get_genai_client() -> "genai.Client":
+    """
+    GenAI client shared by every function of this worker, created on first use.
+    """
+    global _client, _session
+    if _client is None:
+        _session = build_session()
+        _client = build_genai_client(_session)
+        log.info("GenAI client created")
+    return _client
+
+def close_genai_client():
+    global _client, _session
+    if _session is not None:
+        _session.close()
+    _client = None
+    _session = None
@@ -0,0 +1,129 @@
+import asyncio
+import math
+from collections import Counter, defaultdict
+from typing import Optional
+import numpy as np
+from src.functions.embeddings import TOKEN
+from src.functions.executor import run_blocking
+from src.functions.local_index import LocalIndex
+
+# Weaviate's BM25 defaults
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Candidates taken from each of the keyword and vector searches before fusion
+FUSION_POOL = 100
+
+# Weaviate's "en" stopword preset
+STOPWORDS = frozenset("""
+a an and are as at be but by for if in into is it no not of on or such that the their then there
+these they this to was will with
+""".split())
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """
+    Inverted index with BM25 scoring.
+
+    The catalog doesn't change between syncs, so each posting stores its
+    final BM25 weight and scoring a query is one scatter-add per query term.
+    """
+
+    def __init__(self, documents: list[str], k1: float = BM25_K1, b: float = BM25_B):
+        self.size = len(documents)
+        term_docs: dict[str, list[int]] = defaultdict(list)
+        term_freqs: dict[str, list[int]] = defaultdict(list)
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            lengths[doc_id] = sum(counts.values())
+            for term, count in counts.items():
+                term_docs[term].append(doc_id)
+                term_freqs[term].append(count)
+
+        average_length = float(lengths.mean()) if self.size else 0.0
+        norms = k1 * (1 - b + b * lengths / average_length) if average_length else np.full(self.size, k1, dtype=np.float32)
+        self.postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for term, doc_ids in term_docs.items():
+            ids = np.asarray(doc_ids, dtype=np.int32)
+            freqs = np.asarray(term_freqs[term], dtype=np.float32)
+            idf = math.log(1 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            self.postings[term] = (ids, (idf * freqs * (k1 + 1) / (freqs + norms[ids])).astype(np.float32))
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                np.add.at(scores, posting[0], posting[1])
+        return scores
+
+def top_scores(scores: np.ndarray, k: int, positive_only: bool = False) -> dict[int, float]:
+    if positive_only:
+        candidates = np.flatnonzero(scores > 0)
+    else:
+        candidates = np.arange(len(scores))
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return {int(i): float(scores[i]) for i in candidates}
+
+def relative_score_fusion(keyword: dict[int, float], vector: dict[int, float], alpha: float) -> dict[int, float]:
+    """
+    Weaviate's relativeScoreFusion: each result set is min-max scaled to
+    [0, 1], then combined as alpha * vector + (1 - alpha) * keyword. A
+    document missing from one set gets 0 from it.
+    """
+    fused: dict[int, float] = defaultdict(float)
+    for weight, results in ((alpha, vector), (1 - alpha, keyword)):
+        if not results or weight == 0:
+            continue
+        low, high = min(results.values()), max(results.values())
+        for doc_id, score in results.items():
+            fused[doc_id] += weight * ((score - low) / (high - low) if high > low else 1.0)
+    return fused
+
+class HybridIndex:
+    """
+    Keyword + vector search over a LocalIndex with the same alpha semantics
+    as Weaviate's hybrid query: alpha=1 is pure vector, alpha=0 pure BM25.
+    """
+
+    def __init__(self, index: LocalIndex, pool: int = FUSION_POOL):
+        self.index = index
+        self.pool = pool
+        self.bm25 = BM25Index([f"{obj['title'] or ''} {obj['description'] or ''}" for obj in index.objects])
+
+    def search(self, query: str, vector: np.ndarray, alpha: float, limit: int) -> list[tuple[dict, float]]:
+        keyword = top_scores(self.bm25.scores(query), self.pool, positive_only=True) if alpha < 1 else {}
+        semantic = top_scores(self.index.vectors @ vector, self.pool) if alpha > 0 and len(self.index) else {}
+        fused = relative_score_fusion(keyword, semantic, alpha)
+        ranked = sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(self.index.objects[doc_id], score) for doc_id, score in ranked]
+
+_hybrid: Optional[HybridIndex] = None
+_building: Optional[tuple[LocalIndex, asyncio.Task]] = None
+
+async def _build(index: LocalIndex) -> HybridIndex:
+    global _hybrid
+    # Tokenizing the whole snapshot for BM25 stays off the event loop
+    hybrid = await run_blocking(HybridIndex, index)
+    if _building is not None and _building[0] is index:
+        # A build for a newer snapshot may have started meanwhile, it wins
+        _hybrid = hybrid
+    return hybrid
+
+async def get_hybrid_index(index: LocalIndex) -> HybridIndex:
+    """
+    Hybrid index over the current snapshot, rebuilt when the snapshot is
+    reloaded. Concurrent callers share one build.
+    """
+    global _building
+    if _hybrid is not None and _hybrid.index is index:
+        return _hybrid
+    if _building is None or _building[0] is not index or _building[1].done():
+        task = asyncio.ensure_future(_build(index))
+        # Mark the exception as retrieved when every caller stopped waiting
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        _building = (index, task)
+    return await asyncio.shield(_building[1])
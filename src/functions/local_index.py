@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from src.functions.executor import run_blocking
+
+# Where sync-index writes the snapshot of the book collection
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "artifacts/book_index")
+METADATA_FILE = "metadata.json"
+# Seconds between checks for a snapshot replaced by sync-index
+LOCAL_INDEX_CHECK_INTERVAL = float(os.environ.get("LOCAL_INDEX_CHECK_INTERVAL", "1"))
+
+class LocalIndex:
+    """
+    Snapshot of the book collection: one float32 vector per object in a
+    memory-mapped file, and the objects' properties in metadata.json.
+
+    Vectors are unit length, so search is a brute-force batch of dot products,
+    which for a catalog this size is well under a millisecond.
+    """
+
+    def __init__(self, vectors: np.ndarray, objects: list[dict], embedder: str, synced_at: float = 0.0):
+        self.vectors = vectors
+        self.objects = objects
+        self.embedder = embedder
+        self.synced_at = synced_at
+        self._positions = {obj["uuid"]: position for position, obj in enumerate(objects)}
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def position(self, uuid: str) -> Optional[int]:
+        return self._positions.get(uuid)
+
+    def search(self, vector: np.ndarray, limit: int) -> list[tuple[dict, float]]:
+        return self.search_batch(vector[np.newaxis, :], limit)[0]
+
+    def search_batch(self, vectors: np.ndarray, limit: int) -> list[list[tuple[dict, float]]]:
+        """
+        Top `limit` objects with their cosine similarity, for each query vector.
+        """
+        if not self.objects or limit <= 0:
+            return [[] for _ in range(len(vectors))]
+        scores = vectors @ self.vectors.T
+        k = min(limit, len(self.objects))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates], kind="stable")]
+            results.append([(self.objects[i], float(scores[row, i])) for i in ranked])
+        return results
+
+    @classmethod
+    def load(cls, directory: str = LOCAL_INDEX_DIR) -> "LocalIndex":
+        directory = Path(directory)
+        metadata_path = directory / METADATA_FILE
+        if not metadata_path.exists():
+            raise FileNotFoundError(f"No local index in {directory}, build it with `poetry run sync-index`")
+        with open(metadata_path, encoding="utf-8") as metadata_file:
+            metadata = json.load(metadata_file)
+        count, dimensions = len(metadata["objects"]), metadata["dimensions"]
+        if count:
+            vectors = np.memmap(directory / metadata["vectors_file"], dtype=np.float32, mode="r", shape=(count, dimensions))
+        else:
+            vectors = np.zeros((0, dimensions), dtype=np.float32)
+        return cls(vectors, metadata["objects"], metadata["embedder"], metadata.get("synced_at", 0.0))
+
+    @staticmethod
+    def write(directory: str, vectors: np.ndarray, objects: list[dict], embedder: str) -> Path:
+        """
+        Write a snapshot next to the current one and switch to it.
+
+        Each snapshot gets its own vectors file and metadata.json is replaced
+        last, so a reader always sees a matching pair. The previous snapshot's
+        vectors file is kept for one more sync, for readers that loaded the old
+        metadata but haven't opened its vectors yet; older ones are removed.
+        Processes that still map a removed file keep reading it.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        previous = LocalIndex.current_vectors_file(directory)
+        synced_at = time.time()
+        vectors_file = f"vectors-{int(synced_at * 1000)}.f32"
+        np.ascontiguousarray(vectors, dtype=np.float32).tofile(directory / vectors_file)
+
+        metadata = {
+            "embedder": embedder,
+            "dimensions": int(vectors.shape[1]),
+            "vectors_file": vectors_file,
+            "synced_at": synced_at,
+            "objects": objects,
+        }
+        temp_path = directory / f".{METADATA_FILE}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as metadata_file:
+            json.dump(metadata, metadata_file)
+        os.replace(temp_path, directory / METADATA_FILE)
+
+        for old in directory.glob("vectors-*.f32"):
+            if old.name not in (vectors_file, previous):
+                old.unlink(missing_ok=True)
+        return directory
+
+    @staticmethod
+    def current_vectors_file(directory: Path) -> Optional[str]:
+        try:
+            with open(directory / METADATA_FILE, encoding="utf-8") as metadata_file:
+                return json.load(metadata_file).get("vectors_file")
+        except (FileNotFoundError, ValueError):
+            return None
+
+_index: Optional[LocalIndex] = None
+_index_mtime: Optional[float] = None
+_checked_at = 0.0
+_refreshing: Optional[asyncio.Task] = None
+
+def _metadata_mtime(directory: str) -> Optional[float]:
+    try:
+        return (Path(directory) / METADATA_FILE).stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+async def _refresh(directory: str) -> LocalIndex:
+    global _index, _index_mtime, _checked_at
+    mtime = await run_blocking(_metadata_mtime, directory)
+    if _index is None or mtime != _index_mtime:
+        # Parsing the metadata and mapping the vectors stay off the event loop
+        _index = await run_blocking(LocalIndex.load, directory)
+        _index_mtime = mtime
+    _checked_at = time.monotonic()
+    return _index
+
+async def get_local_index(directory: str = LOCAL_INDEX_DIR) -> LocalIndex:
+    """
+    The local snapshot, loaded once and reloaded when sync-index replaces it.
+    Concurrent callers share one check or reload.
+    """
+    global _refreshing
+    if _index is not None and time.monotonic() - _checked_at < LOCAL_INDEX_CHECK_INTERVAL:
+        return _index
+    if _refreshing is None or _refreshing.done():
+        _refreshing = asyncio.ensure_future(_refresh(directory))
+        # Mark the exception as retrieved when every caller stopped waiting
+        _refreshing.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return await asyncio.shield(_refreshing)
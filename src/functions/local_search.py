@@ -0,0 +1,27 @@
+import os
+from src.functions.embeddings import embed_query
+from src.functions.local_index import get_local_index
+from src.functions.local_hybrid import get_hybrid_index
+
+# "weaviate" queries the cloud cluster, "local" the snapshot written by sync-index
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "weaviate")
+
+async def local_vector_search(query: str, limit: int) -> list[dict]:
+    """
+    Nearest books to the query in the local snapshot, embedded with the model
+    the snapshot was built with.
+    """
+    index = await get_local_index()
+    vector = await embed_query(query, index.embedder)
+    return [obj for obj, _ in index.search(vector, limit)]
+
+async def local_hybrid_search(query: str, alpha: float, limit: int) -> list[dict]:
+    """
+    BM25 and vector results over the local snapshot, fused like Weaviate's hybrid query.
+    """
+    index = await get_local_index()
+    hybrid = await get_hybrid_index(index)
+    vector = None
+    if alpha > 0:
+        vector = await embed_query(query, index.embedder)
+    return [obj for obj, _ in hybrid.search(query, vector, alpha, limit)]
@@ -0,0 +1,305 @@
+import asyncio
+import contextlib
+import functools
+import os
+import threading
+import time
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+from restack_ai.function import function_info, log
+from restack_ai.pydantic import PydanticPayloadConverter
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import DataConverter
+
+# Port of the Prometheus text endpoint (/metrics), 0 disables it
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+# File the metrics are written to every METRICS_EXPORT_INTERVAL seconds, e.g.
+# for the node_exporter textfile collector. Empty disables it.
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_EXPORT_INTERVAL = float(os.environ.get("METRICS_EXPORT_INTERVAL", "15"))
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Spans go to OpenTelemetry when it is installed, they are no-ops until an SDK is configured
+try:
+    from opentelemetry import trace
+    tracer = trace.get_tracer("restack-ai-weaviate-curriculum")
+except ImportError:
+    tracer = None
+
+LabelSet = tuple[tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+class MetricsRegistry:
+    """
+    Counters and histograms keyed by name and labels, plus collectors read
+    when the metrics are rendered (the stats of the caches and pools). Values
+    are recorded from the event loop and executor threads and rendered from
+    the endpoint thread, so every access holds a lock.
+    """
+
+    def __init__(self):
+        self._counters: dict[str, dict[LabelSet, float]] = {}
+        self._histograms: dict[str, dict[LabelSet, Histogram]] = {}
+        self._collectors: list[tuple[str, Callable[[], Any]]] = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, /, **labels):
+        key = self._labels(labels)
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[key] = counter.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, /, buckets: tuple = DURATION_BUCKETS, **labels):
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    @contextlib.contextmanager
+    def timed(self, name: str, /, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_stats(self, prefix: str, stats: Callable[[], Any]):
+        """
+        Report every number of stats() (a pydantic model or a dict) as a
+        gauge named prefix_field.
+        """
+        self._collectors.append((prefix, stats))
+
+    def render(self) -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{self._format(labels)} {value:g}" for labels, value in series.items())
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._format(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                    lines.append(f"{name}_bucket{self._format(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{self._format(labels)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{self._format(labels)} {histogram.count}")
+        for prefix, stats in self._collectors:
+            try:
+                values = stats()
+                values = values.model_dump() if hasattr(values, "model_dump") else values
+            except Exception as e:
+                log.warning(f"Failed to collect {prefix} stats", error=e)
+                continue
+            for field, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{field} gauge")
+                    lines.append(f"{prefix}_{field} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _labels(labels: dict) -> LabelSet:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    @staticmethod
+    def _format(labels: LabelSet) -> str:
+        if not labels:
+            return ""
+        escaped = (
+            f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for name, value in labels
+        )
+        return "{" + ",".join(escaped) + "}"
+
+metrics = MetricsRegistry()
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+# Size of the arguments Temporal decoded for the function about to run in this task
+_input_bytes: ContextVar[Optional[int]] = ContextVar("function_input_bytes", default=None)
+# Result of the function that just returned in this task, until Temporal encodes it
+_returned: ContextVar[Optional[tuple[Any, dict]]] = ContextVar("function_returned", default=None)
+
+def payload_bytes(payloads: Sequence[Payload]) -> int:
+    return sum(payload.ByteSize() for payload in payloads)
+
+class MeasuredPayloadConverter(PydanticPayloadConverter):
+    """
+    Restack's payload converter, also recording the size of the payloads a
+    function receives and returns, as they are stored in the workflow
+    history, and how long encoding the result took. Nothing is serialized
+    twice: the sizes are those of the payloads Temporal sends anyway.
+    """
+
+    def to_payloads(self, values: Sequence[Any]) -> list[Payload]:
+        start = time.perf_counter()
+        payloads = super().to_payloads(values)
+        returned = _returned.get()
+        # Only the result of an instrumented function, not e.g. the events it sends to a workflow
+        if returned is not None and len(values) == 1 and values[0] is returned[0]:
+            _returned.set(None)
+            labels = returned[1]
+            metrics.observe("function_serialization_seconds", time.perf_counter() - start, **labels)
+            metrics.observe("function_output_bytes", payload_bytes(payloads), buckets=SIZE_BUCKETS, **labels)
+        return payloads
+
+    def from_payloads(self, payloads: Sequence[Payload], type_hints: Optional[list] = None) -> list[Any]:
+        # The arguments are decoded before the function's context exists,
+        # instrument picks the size up when the function starts
+        _input_bytes.set(payload_bytes(payloads))
+        return super().from_payloads(payloads, type_hints)
+
+# Passed to the Restack client, see src/client.py
+measured_data_converter = DataConverter(payload_converter_class=MeasuredPayloadConverter)
+
+def instrument(fn: Callable):
+    """
+    Record the queue time, execution time, payload sizes, cache hits and
+    outcome of a function. Put it under @function.defn(), which reads the
+    signature of the wrapped function.
+    """
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(input):
+        labels = {"function": name, "task_queue": ""}
+        try:
+            info = function_info()
+            labels["task_queue"] = info.task_queue
+            # Waiting for a free worker slot, including the queue's rate limit
+            queued = (info.started_time - info.current_attempt_scheduled_time).total_seconds()
+            metrics.observe("function_queue_seconds", max(0.0, queued), **labels)
+        except RuntimeError:
+            # Called directly, not as a workflow step
+            pass
+
+        input_bytes = _input_bytes.get()
+        _input_bytes.set(None)
+        if input_bytes is not None:
+            metrics.observe("function_input_bytes", input_bytes, buckets=SIZE_BUCKETS, **labels)
+        start = time.perf_counter()
+        with span(f"function {name}", **labels) as current:
+            try:
+                output = await fn(input)
+            except BaseException as e:
+                outcome = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+                metrics.observe("function_duration_seconds", time.perf_counter() - start, outcome=outcome, **labels)
+                metrics.inc("function_calls_total", outcome=outcome, **labels)
+                raise
+            metrics.observe("function_duration_seconds", time.perf_counter() - start, outcome="ok", **labels)
+            metrics.inc("function_calls_total", outcome="ok", **labels)
+
+            if getattr(output, "cached", False):
+                metrics.inc("function_cache_hits_total", **labels)
+            if current is not None and input_bytes is not None:
+                current.set_attribute("input_bytes", input_bytes)
+        # Output size and serialization time are recorded when Temporal encodes it
+        _returned.set((output, labels))
+        return output
+
+    return wrapper
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = metrics
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def write_metrics_file(path: str, registry: MetricsRegistry = metrics):
+    # Written next to the target and renamed, so readers never see a partial file
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    temporary.write_text(registry.render(), encoding="utf-8")
+    os.replace(temporary, target)
+
+class MetricsExporter:
+    """
+    Serves the registry on port and/or writes it to path every interval
+    seconds, as configured. Started and closed by the services.
+    """
+
+    def __init__(self, registry: MetricsRegistry = metrics, port: int = METRICS_PORT, path: str = METRICS_FILE, interval: float = METRICS_EXPORT_INTERVAL):
+        self.registry = registry
+        self.port = port
+        self.path = path
+        self.interval = interval
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.port:
+            handler = type("Handler", (MetricsHandler,), {"registry": self.registry})
+            self._server = ThreadingHTTPServer(("0.0.0.0", self.port), handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+            print(f"Metrics served on http://localhost:{self._server.server_port}/metrics")
+        if self.path:
+            self._task = asyncio.ensure_future(self._export_loop())
+            print(f"Metrics written to {self.path} every {self.interval:g}s")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            # Last values, so a stopped worker leaves complete numbers behind
+            write_metrics_file(self.path, self.registry)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    async def _export_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                write_metrics_file(self.path, self.registry)
+            except OSError as e:
+                log.warning("Failed to write metrics file", error=e)
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+import numpy as np
+from pydantic import BaseModel
+from src.functions.embeddings import embed_query
+from src.functions.metrics import metrics
+
+class SearchCacheStats(BaseModel):
+    hits: int = 0
+    near_duplicate_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    size: int = 0
+
+class CacheBackend(ABC):
+    """
+    Storage interface for the search cache.
+
+    The in-process backend below is the default. A shared backend (e.g. Redis)
+    implements these coroutines; a backend missing one can't be created.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def clear(self):
+        ...
+
+    @abstractmethod
+    async def size(self) -> int:
+        ...
+
+class InMemoryBackend(CacheBackend):
+    """
+    LRU dict with a per-entry expiry time.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def clear(self):
+        self._entries.clear()
+
+    async def size(self) -> int:
+        return len(self._entries)
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def cosine_distance(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    if norm == 0:
+        return 1.0
+    return 1.0 - float(a @ b) / norm
+
+class SearchCache:
+    """
+    Result cache for the Weaviate search functions.
+
+    Entries are keyed on the search name, the normalized query and the search
+    parameters (alpha, limit, ...). When an embedder and a max distance are
+    configured, a miss falls back to the closest cached query with the same
+    parameters if its embedding is within that distance.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        ttl: float = 3600.0,
+        near_duplicate_distance: Optional[float] = None,
+        embed: Optional[Callable[[str], Awaitable[list[float]]]] = None,
+        max_near_duplicates: int = 1024,
+    ):
+        self.backend = backend or InMemoryBackend()
+        self.ttl = ttl
+        self.near_duplicate_distance = near_duplicate_distance
+        self.embed = embed
+        self.max_near_duplicates = max_near_duplicates
+        self._stats = SearchCacheStats()
+        # key -> (parameter signature, query embedding) for near-duplicate lookups
+        self._vectors: OrderedDict[str, tuple[str, list[float]]] = OrderedDict()
+        # A miss embeds the query once for the lookup and reuses it for the set
+        self._last_embedding: Optional[tuple[str, list[float]]] = None
+        # key -> task of a lookup that is still running
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def make_key(self, name: str, query: str, **params) -> str:
+        signature = self._signature(name, params)
+        digest = hashlib.sha256(f"{signature}\n{normalize_query(query)}".encode()).hexdigest()
+        return f"search:{digest}"
+
+    async def get(self, name: str, query: str, **params) -> Optional[Any]:
+        value = await self.backend.get(self.make_key(name, query, **params))
+        if value is not None:
+            self._stats.hits += 1
+            metrics.inc("search_cache_lookups_total", search=name, result="hit")
+            return value
+
+        if self._near_duplicates_enabled():
+            value = await self._get_near_duplicate(self._signature(name, params), query)
+            if value is not None:
+                self._stats.near_duplicate_hits += 1
+                metrics.inc("search_cache_lookups_total", search=name, result="near_duplicate")
+                return value
+
+        self._stats.misses += 1
+        metrics.inc("search_cache_lookups_total", search=name, result="miss")
+        return None
+
+    async def set(self, name: str, query: str, value: Any, **params):
+        key = self.make_key(name, query, **params)
+        await self.backend.set(key, value, self.ttl)
+        if self._near_duplicates_enabled():
+            vector = await self._embed(query)
+            self._vectors[key] = (self._signature(name, params), vector)
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_near_duplicates:
+                self._vectors.popitem(last=False)
+
+    async def get_or_compute(self, name: str, query: str, compute: Callable[[], Awaitable[Any]], **params) -> Any:
+        """
+        Return the cached value or run `compute` and cache its result.
+
+        Concurrent callers asking for the same key share one computation
+        instead of each querying Weaviate. The computation runs in its own
+        task, so a caller that is cancelled only stops waiting for it; the
+        others still get the result.
+        """
+        key = self.make_key(name, query, **params)
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._stats.coalesced += 1
+            metrics.inc("search_cache_lookups_total", search=name, result="coalesced")
+            return await asyncio.shield(in_flight)
+
+        value = await self.get(name, query, **params)
+        if value is not None:
+            return value
+
+        # Another caller may have started the same lookup while we were checking the cache
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._stats.coalesced += 1
+            metrics.inc("search_cache_lookups_total", search=name, result="coalesced")
+            return await asyncio.shield(in_flight)
+
+        in_flight = asyncio.ensure_future(self._compute(key, name, query, compute, params))
+        # Mark the exception as retrieved when every caller stopped waiting
+        in_flight.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self._in_flight[key] = in_flight
+        return await asyncio.shield(in_flight)
+
+    async def _compute(self, key: str, name: str, query: str, compute: Callable[[], Awaitable[Any]], params: dict) -> Any:
+        try:
+            value = await compute()
+            await self.set(name, query, value, **params)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    async def clear(self):
+        await self.backend.clear()
+        self._vectors.clear()
+
+    async def stats(self) -> SearchCacheStats:
+        stats = self._stats.model_copy()
+        stats.size = await self.backend.size()
+        stats.evictions = getattr(self.backend, "evictions", 0)
+        return stats
+
+    def _near_duplicates_enabled(self) -> bool:
+        return self.embed is not None and self.near_duplicate_distance is not None
+
+    async def _embed(self, query: str) -> list[float]:
+        normalized = normalize_query(query)
+        if self._last_embedding is None or self._last_embedding[0] != normalized:
+            self._last_embedding = (normalized, await self.embed(normalized))
+        return self._last_embedding[1]
+
+    async def _get_near_duplicate(self, signature: str, query: str) -> Optional[Any]:
+        vector = await self._embed(query)
+        best_key, best_distance = None, self.near_duplicate_distance
+        for key, (key_signature, cached_vector) in self._vectors.items():
+            if key_signature != signature:
+                continue
+            distance = cosine_distance(vector, cached_vector)
+            if distance <= best_distance:
+                best_key, best_distance = key, distance
+        if best_key is None:
+            return None
+
+        value = await self.backend.get(best_key)
+        if value is None:
+            # Expired or evicted from the backend
+            self._vectors.pop(best_key, None)
+        return value
+
+    @staticmethod
+    def _signature(name: str, params: dict) -> str:
+        return f"{name}:{json.dumps(params, sort_keys=True)}"
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+search_cache = SearchCache(
+    backend=InMemoryBackend(max_entries=int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "1024"))),
+    ttl=float(os.environ.get("SEARCH_CACHE_TTL", "3600")),
+    near_duplicate_distance=_env_float("SEARCH_CACHE_NEAR_DUPLICATE_DISTANCE"),
+    # Query embeddings are cached, so a near-duplicate lookup costs one model call per new query
+    embed=embed_query,
+)
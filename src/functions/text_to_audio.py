@@ -1,38 +1,174 @@
+import asyncio
+import io
 import os
+import re
+import wave
+from collections import deque
+from typing import AsyncIterator, Optional
 from restack_ai.function import function, log
+from src.functions.metrics import instrument, metrics
 from pydantic import BaseModel
-from google import genai
+from src.functions.executor import run_blocking
+from src.functions.artifact_store import ArtifactStore
+from src.functions.genai_client import get_genai_client
 
 class AudioInput(BaseModel):
     text: str
+    voice: Optional[str] = None
 
 class AudioOutput(BaseModel):
     audio_file: str
+    artifact_id: str
+    size_bytes: int
+    cached: bool = False
+
+AUDIO_MODEL = 'gemini-1.5-flash'
+# Sentences are grouped into chunks of about this many characters
+MAX_CHUNK_CHARS = int(os.environ.get("AUDIO_MAX_CHUNK_CHARS", "600"))
+# Chunks synthesized at the same time, also bounds the chunks held in memory
+SYNTHESIS_CONCURRENCY = int(os.environ.get("AUDIO_SYNTHESIS_CONCURRENCY", "4"))
+# Raw PCM answers (no WAV header) are 16-bit mono at this rate
+PCM_SAMPLE_RATE = int(os.environ.get("AUDIO_PCM_SAMPLE_RATE", "24000"))
+
+audio_store = ArtifactStore(
+    root=os.environ.get("AUDIO_ARTIFACT_DIR", "artifacts/audio"),
+    max_bytes=int(os.environ.get("AUDIO_ARTIFACT_MAX_BYTES", str(500 * 1024 * 1024))),
+)
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def split_into_chunks(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list[str]:
+    """
+    Split text at sentence boundaries into chunks of at most max_chars
+    (a single longer sentence becomes its own chunk).
+    """
+    chunks, current = [], ""
+    for sentence in SENTENCE_END.split(text.strip()):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def extract_audio(response) -> bytes:
+    for candidate in response.candidates or []:
+        for part in candidate.content.parts or []:
+            if part.inline_data and part.inline_data.data:
+                return part.inline_data.data
+    # Fallback for SDK versions exposing the bytes directly
+    return response.audio
+
+def read_frames(audio: bytes) -> tuple[tuple, bytes]:
+    """
+    Return (nchannels, sampwidth, framerate) and the PCM frames of a chunk.
+    """
+    if audio[:4] == b"RIFF":
+        with wave.open(io.BytesIO(audio), "rb") as chunk:
+            return (chunk.getnchannels(), chunk.getsampwidth(), chunk.getframerate()), chunk.readframes(chunk.getnframes())
+    return (1, 2, PCM_SAMPLE_RATE), audio
+
+async def synthesize(client, text: str, voice: Optional[str]) -> bytes:
+    config = {"response_mime_type": "audio/wav"}
+    if voice:
+        from google.genai import types
+
+        config["speech_config"] = types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice)
+            )
+        )
+    with metrics.timed("audio_chunk_synthesis_seconds"):
+        response = await client.aio.models.generate_content(
+            model=AUDIO_MODEL,
+            contents=[text],
+            config=config
+        )
+    return extract_audio(response)
+
+async def synthesize_in_order(client, chunks: list[str], voice: Optional[str]) -> AsyncIterator[bytes]:
+    """
+    Synthesize chunks concurrently and yield their audio in text order.
+
+    At most SYNTHESIS_CONCURRENCY chunks are requested ahead of the one
+    being written.
+    """
+    remaining = iter(chunks)
+    pending = deque()
+    for chunk in remaining:
+        pending.append(asyncio.ensure_future(synthesize(client, chunk, voice)))
+        if len(pending) >= SYNTHESIS_CONCURRENCY:
+            break
+    try:
+        while pending:
+            audio = await pending.popleft()
+            next_chunk = next(remaining, None)
+            if next_chunk is not None:
+                pending.append(asyncio.ensure_future(synthesize(client, next_chunk, voice)))
+            yield audio
+    finally:
+        for task in pending:
+            task.cancel()
+
+def _open_wav(artifact_file, params: tuple) -> wave.Wave_write:
+    writer = wave.open(artifact_file, "wb")
+    writer.setnchannels(params[0])
+    writer.setsampwidth(params[1])
+    writer.setframerate(params[2])
+    return writer
 
 @function.defn()
+@instrument
 async def text_to_audio(input: AudioInput) -> AudioOutput:
     """
     Convert text summary into an audio file using Gemini's text-to-speech capabilities.
     """
     try:
+        if not input.text.strip():
+            # Would store an empty file, served to every later call as a hit
+            raise ValueError("Invalid text input. Please provide non-empty text.")
+
+        artifact_id = ArtifactStore.make_key(AUDIO_MODEL, input.voice or "", input.text) + ".wav"
+        cached_path = await run_blocking(audio_store.get, artifact_id)
+        if cached_path is not None:
+            log.info(f"Audio served from artifact store: {artifact_id}")
+            return AudioOutput(
+                audio_file=str(cached_path),
+                artifact_id=artifact_id,
+                size_bytes=await run_blocking(os.path.getsize, cached_path),
+                cached=True
+            )
+
         log.info("Starting text-to-audio conversion...")
-        client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
-
-        response = client.models.generate_content(
-            model='gemini-1.5-flash',
-            contents=[input.text],
-            config={
-                "response_mime_type": "audio/wav"
-            }
-        )
+        client = get_genai_client()
+        chunks = split_into_chunks(input.text)
 
-        # Save the audio file
-        audio_filename = "summary_audio.wav"
-        with open(audio_filename, "wb") as audio_file:
-            audio_file.write(response.audio)  # Assuming response.audio contains the audio bytes
+        # Stream each chunk's frames into the artifact as soon as it is its turn
+        # Raising inside the block removes the partial file, nothing reaches the store
+        async with audio_store.open_async_writer(artifact_id) as artifact_file:
+            writer = None
+            try:
+                async for audio in synthesize_in_order(client, chunks, input.voice):
+                    params, frames = read_frames(audio)
+                    if writer is None:
+                        writer = _open_wav(artifact_file, params)
+                    await run_blocking(writer.writeframes, frames)
+                if writer is None:
+                    raise ValueError("No audio was generated")
+            finally:
+                # Closed before the file is, also when a chunk failed
+                if writer is not None:
+                    await run_blocking(writer.close)
 
-        log.info(f"Audio file saved: {audio_filename}")
-        return AudioOutput(audio_file=audio_filename)
+        path = audio_store.path(artifact_id)
+        log.info(f"Audio file saved: {path} ({len(chunks)} chunks)")
+        return AudioOutput(
+            audio_file=str(path),
+            artifact_id=artifact_id,
+            size_bytes=await run_blocking(os.path.getsize, path)
+        )
 
     except Exception as e:
         log.error("Error in text_to_audio function", error=e)
@@ -1,15 +1,80 @@
-import os
+import re
+from typing import Iterable, Iterator, Literal
 from restack_ai.function import function, log
+from src.functions.metrics import instrument
 from pydantic import BaseModel
 
 class BrailleInput(BaseModel):
     text: str
+    # 1 = uncontracted, 2 = contracted (UEB Grade 2)
+    grade: Literal[1, 2] = 1
 
 class BrailleOutput(BaseModel):
     braille_text: str
 
+class BrailleBulkInput(BaseModel):
+    texts: list[str]
+    grade: Literal[1, 2] = 1
+
+class BrailleBulkOutput(BaseModel):
+    braille_texts: list[str]
+
+# Braille Conversion Table
+BRAILLE_MAP = {
+    'a': '⠁', 'b': '⠃', 'c': '⠉', 'd': '⠙', 'e': '⠑',
+    'f': '⠋', 'g': '⠛', 'h': '⠓', 'i': '⠊', 'j': '⠚',
+    'k': '⠅', 'l': '⠇', 'm': '⠍', 'n': '⠝', 'o': '⠕',
+    'p': '⠏', 'q': '⠟', 'r': '⠗', 's': '⠎', 't': '⠞',
+    'u': '⠥', 'v': '⠧', 'w': '⠺', 'x': '⠭', 'y': '⠽',
+    'z': '⠵',
+    'A': '⠠⠁', 'B': '⠠⠃', 'C': '⠠⠉', 'D': '⠠⠙', 'E': '⠠⠑',
+    'F': '⠠⠋', 'G': '⠠⠛', 'H': '⠠⠓', 'I': '⠠⠊', 'J': '⠠⠚',
+    'K': '⠠⠅', 'L': '⠠⠇', 'M': '⠠⠍', 'N': '⠠⠝', 'O': '⠠⠕',
+    'P': '⠠⠏', 'Q': '⠠⠟', 'R': '⠠⠗', 'S': '⠠⠎', 'T': '⠠⠞',
+    'U': '⠠⠥', 'V': '⠠⠧', 'W': '⠠⠺', 'X': '⠠⠭', 'Y': '⠠⠽',
+    'Z': '⠠⠵',
+    '0': '⠼⠚', '1': '⠼⠁', '2': '⠼⠃', '3': '⠼⠉', '4': '⠼⠙',
+    '5': '⠼⠑', '6': '⠼⠋', '7': '⠼⠛', '8': '⠼⠓', '9': '⠼⠊',
+    ',': '⠂', ';': '⠆', ':': '⠒', '.': '⠲', '!': '⠖',
+    '(': '⠶', ')': '⠶', '?': '⠦', '-': '⠤', ' ': ' ',
+    '\'': '⠄', '\"': '⠐', '/': '⠌', '\\': '⠸', '@': '⠈',
+    '#': '⠼', '$': '⠫', '%': '⠩', '&': '⠯', '*': '⠡',
+    '+': '⠬', '=': '⠿', '<': '⠣', '>': '⠜', '^': '⠘',
+    '_': '⠸', '`': '⠈', '{': '⠷', '}': '⠾', '[': '⠪',
+    ']': '⠻', '|': '⠳', '~': '⠴'
+}
+
+NUMERIC_INDICATOR = '⠼'
+GRADE1_INDICATOR = '⠰'
+# Inside a number digits use the a-j cells, the numeric indicator is added once per run
+DIGIT_CELLS = {digit: BRAILLE_MAP[digit][1:] for digit in "0123456789"}
+
+# Built once at import, str.translate maps a character to a multi-cell string (capitals)
+BRAILLE_TABLE = str.maketrans({**BRAILLE_MAP, **DIGIT_CELLS})
+
+# A digit run, "1,000" and "3.5" stay one number. The lookahead captures a
+# following a-j letter, which would otherwise read as another digit.
+NUMBER_RUN = re.compile(r"[0-9]+(?:[.,][0-9]+)*(?=([a-j]?))")
+
+def _mark_number(match: re.Match) -> str:
+    if match.group(1):
+        return NUMERIC_INDICATOR + match.group(0) + GRADE1_INDICATOR
+    return NUMERIC_INDICATOR + match.group(0)
+
+def mark_numbers(text: str) -> str:
+    """
+    Insert the numeric and grade 1 indicators around digit runs.
+    """
+    return NUMBER_RUN.sub(_mark_number, text)
+
+def translate_grade1(text: str) -> str:
+    """
+    Uncontracted translation, one numeric indicator per digit run.
+    """
+    return mark_numbers(text).translate(BRAILLE_TABLE)
+
 # Braille Conversion Function
-def convert_text_to_braille(text):
+def convert_text_to_braille(text, grade: int = 1):
     """
     Convert a given text into a Braille representation while preserving formatting,
     such as line breaks and paragraph spacing.
@@ -17,44 +82,48 @@ def convert_text_to_braille(text):
     if not text or not isinstance(text, str):
         raise ValueError("Invalid text input. Please provide non-empty string data.")
 
-    braille_map = {
-        'a': '⠁', 'b': '⠃', 'c': '⠉', 'd': '⠙', 'e': '⠑',
-        'f': '⠋', 'g': '⠛', 'h': '⠓', 'i': '⠊', 'j': '⠚',
-        'k': '⠅', 'l': '⠇', 'm': '⠍', 'n': '⠝', 'o': '⠕',
-        'p': '⠏', 'q': '⠟', 'r': '⠗', 's': '⠎', 't': '⠞',
-        'u': '⠥', 'v': '⠧', 'w': '⠺', 'x': '⠭', 'y': '⠽',
-        'z': '⠵',
-        'A': '⠠⠁', 'B': '⠠⠃', 'C': '⠠⠉', 'D': '⠠⠙', 'E': '⠠⠑',
-        'F': '⠠⠋', 'G': '⠠⠛', 'H': '⠠⠓', 'I': '⠠⠊', 'J': '⠠⠚',
-        'K': '⠠⠅', 'L': '⠠⠇', 'M': '⠠⠍', 'N': '⠠⠝', 'O': '⠠⠕',
-        'P': '⠠⠏', 'Q': '⠠⠟', 'R': '⠠⠗', 'S': '⠠⠎', 'T': '⠠⠞',
-        'U': '⠠⠥', 'V': '⠠⠧', 'W': '⠠⠺', 'X': '⠠⠭', 'Y': '⠠⠽',
-        'Z': '⠠⠵',
-        '0': '⠼⠚', '1': '⠼⠁', '2': '⠼⠃', '3': '⠼⠉', '4': '⠼⠙',
-        '5': '⠼⠑', '6': '⠼⠋', '7': '⠼⠛', '8': '⠼⠓', '9': '⠼⠊',
-        ',': '⠂', ';': '⠆', ':': '⠒', '.': '⠲', '!': '⠖',
-        '(': '⠶', ')': '⠶', '?': '⠦', '-': '⠤', ' ': ' ',
-        '\'': '⠄', '\"': '⠐', '/': '⠌', '\\': '⠸', '@': '⠈',
-        '#': '⠼', '$': '⠫', '%': '⠩', '&': '⠯', '*': '⠡',
-        '+': '⠬', '=': '⠿', '<': '⠣', '>': '⠜', '^': '⠘',
-        '_': '⠸', '`': '⠈', '{': '⠷', '}': '⠾', '[': '⠪',
-        ']': '⠻', '|': '⠳', '~': '⠴'
-    }
-
-    lines = text.splitlines()
-    braille_lines = ["".join(braille_map.get(char, char) for char in line) for line in lines]
-
-    return "\n".join(braille_lines)
+    if grade == 2:
+        # Imported here so the contraction table is only loaded when needed
+        from src.functions.braille_grade2 import translate_grade2
+        braille = translate_grade2(text)
+    else:
+        braille = translate_grade1(text)
+    return "\n".join(braille.splitlines())
+
+def iter_braille(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Translate a large document chunk by chunk, e.g. lines of a file.
+
+    Unlike convert_text_to_braille, line breaks are passed through untouched.
+    Split chunks at whitespace so numbers aren't cut in two.
+    """
+    for chunk in chunks:
+        yield translate_grade1(chunk)
 
 @function.defn()
+@instrument
 async def text_to_braille(input: BrailleInput) -> BrailleOutput:
     """
     Convert input text to Braille and return the result.
     """
     try:
-        braille_text = convert_text_to_braille(input.text)
-        log.info(f"Converted text to Braille: {braille_text}")
+        braille_text = convert_text_to_braille(input.text, grade=input.grade)
+        log.info(f"Converted {len(input.text)} characters to Grade {input.grade} Braille")
         return BrailleOutput(braille_text=braille_text)
     except Exception as e:
         log.error("Error in text_to_braille function", error=e)
         raise e
+
+@function.defn()
+@instrument
+async def text_to_braille_bulk(input: BrailleBulkInput) -> BrailleBulkOutput:
+    """
+    Convert a list of texts to Braille in a single function call.
+    """
+    try:
+        braille_texts = [convert_text_to_braille(text, grade=input.grade) for text in input.texts]
+        log.info(f"Converted {len(braille_texts)} texts to Braille")
+        return BrailleBulkOutput(braille_texts=braille_texts)
+    except Exception as e:
+        log.error("Error in text_to_braille_bulk function", error=e)
+        raise e
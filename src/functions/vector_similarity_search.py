@@ -1,15 +1,15 @@
 import os
 import json
+import asyncio
 from restack_ai.function import function, log
+from src.functions.metrics import instrument
 from pydantic import BaseModel
-import weaviate
-from weaviate.classes.init import Auth
-
-# Import weaviate_tools if it's defined in weaviate_functions.py
-try:
-    from src.functions.weaviate_functions import weaviate_tools
-except ImportError:
-    weaviate_tools = []  # Fallback to an empty list if import fails
+from src.functions.weaviate_pool import weaviate_client
+from src.functions.search_cache import search_cache
+from src.functions.local_search import SEARCH_BACKEND, local_vector_search
+from src.functions.embeddings import DEFAULT_EMBEDDER, embed_query, get_embedder
+from src.functions.executor import run_blocking
+from src.functions.weaviate_functions import merge_results
 
 class VectorSearchInput(BaseModel):
     query: str
@@ -22,65 +22,96 @@ class SearchResult(BaseModel):
 class VectorSearchOutput(BaseModel):
     results: list[SearchResult]
 
-def weaviate_client():
+class VectorSearchBatchInput(BaseModel):
+    queries: list[str]
+    limit: int = 3
+
+class VectorSearchBatchOutput(BaseModel):
+    # Every result found, once, even when several queries returned it
+    results: list[SearchResult]
+    # For each query, the positions of its results in results
+    matches: list[list[int]]
+
+    def for_query(self, position: int) -> VectorSearchOutput:
+        return VectorSearchOutput(results=[self.results[i] for i in self.matches[position]])
+
+async def query_near_vector(query: str, limit: int) -> dict:
+    client = await weaviate_client()
+
+    # Access the collection
+    collection = client.collections.get("BookVectorizedByWeaviateEmbeddings")
+
+    # The collection's vectors come from EMBEDDING_MODEL, so the query is embedded with it
+    vector = await embed_query(query)
+
+    # Perform a nearest-neighbor vector search
+    response = await collection.query.near_vector(
+        near_vector=vector,
+        limit=limit
+    )
+
+    log.info(f"Vector search response: {response}")
+
+    results = [
+        SearchResult(
+            title=obj.properties.get("title", "No Title"),
+            content=obj.properties.get("description", "No Description")
+        )
+        for obj in response.objects
+    ]
+
+    return VectorSearchOutput(results=results).model_dump()
+
+async def query_near_vector_local(query: str, limit: int) -> dict:
+    results = [
+        SearchResult(title=obj["title"] or "No Title", content=obj["description"] or "No Description")
+        for obj in await local_vector_search(query, limit)
+    ]
+    return VectorSearchOutput(results=results).model_dump()
+
+async def check_embedder():
     """
-    Establish a connection to the Weaviate Cloud instance.
+    Load the query embedder when the worker starts, so a model that can't
+    load (e.g. sentence-transformers missing) stops the worker instead of
+    failing every vector_similarity_search call.
     """
-    wcd_url = "https://4zfylktqsqkmqkougroa.c0.us-east1.gcp.weaviate.cloud"
-    wcd_api_key = "UGbNHq95PEfuac6caJPFLBnMNLyzoIReZSIG"  # READ ONLY API KEY
+    if SEARCH_BACKEND == "local":
+        # The snapshot's embedder is known once sync-index wrote it, possibly after the worker started
+        return
+    await run_blocking(get_embedder, DEFAULT_EMBEDDER)
 
-    client = weaviate.connect_to_weaviate_cloud(
-        cluster_url=wcd_url,
-        auth_credentials=Auth.api_key(wcd_api_key),
+async def cached_near_vector(query: str, limit: int) -> dict:
+    compute = query_near_vector_local if SEARCH_BACKEND == "local" else query_near_vector
+    return await search_cache.get_or_compute(
+        "vector_similarity_search", query,
+        lambda: compute(query, limit),
+        limit=limit, backend=SEARCH_BACKEND
     )
-    return client
 
 @function.defn()
+@instrument
 async def vector_similarity_search(input: VectorSearchInput) -> VectorSearchOutput:
     """
     Perform a vector-based similarity search in Weaviate using embeddings.
     """
     try:
-        client = weaviate_client()
-        log.info(f"Connected to Weaviate Cloud: {client}")
-
-        # Access the collection
-        collection = client.collections.get("BookVectorizedByWeaviateEmbeddings")
-
-        # Perform a nearest-neighbor vector search
-        response = collection.query.near_vector(
-            vector=input.query,
-            limit=input.limit
-        )
-
-        log.info(f"Vector search response: {response}")
-
-        results = [
-            SearchResult(
-                title=obj.properties.get("title", "No Title"),
-                content=obj.properties.get("description", "No Description")
-            )
-            for obj in response.objects
-        ]
-
-        client.close()
-        return VectorSearchOutput(results=results)
+        return VectorSearchOutput.model_validate(await cached_near_vector(input.query, input.limit))
 
     except Exception as e:
         log.error("Vector similarity search failed", error=e)
         raise e
 
-# ✅ Append the function to weaviate_tools safely
-if isinstance(weaviate_tools, list):  # Ensure it's a list
-    weaviate_tools.append({
-        "name": "vector_similarity_search",
-        "description": "Finds relevant content using vector similarity search in Weaviate.",
-        "parameters": {
-            "type": "OBJECT",
-            "properties": {
-                "query": {"type": "STRING"},
-                "limit": {"type": "INTEGER"}
-            },
-            "required": ["query"]
-        }
-    })
+@function.defn()
+@instrument
+async def vector_similarity_search_batch(input: VectorSearchBatchInput) -> VectorSearchBatchOutput:
+    """
+    vector_similarity_search for several queries in one function call.
+    """
+    try:
+        outputs = await asyncio.gather(*(cached_near_vector(query, input.limit) for query in input.queries))
+        results, matches = merge_results([output["results"] for output in outputs])
+        return VectorSearchBatchOutput(results=results, matches=matches)
+
+    except Exception as e:
+        log.error("Vector similarity batch search failed", error=e)
+        raise e
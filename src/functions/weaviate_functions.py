@@ -1,8 +1,11 @@
+import asyncio
 from restack_ai.function import function, log
+from src.functions.metrics import instrument
 from pydantic import BaseModel
-import weaviate
-from weaviate.classes.init import Auth
-import os, json
+from src.functions.weaviate_pool import weaviate_client
+from src.functions.search_cache import search_cache
+from src.functions.local_search import SEARCH_BACKEND, local_vector_search, local_hybrid_search
+import json
 
 class QueryInput(BaseModel):
     user_content: str
@@ -14,86 +17,169 @@ class BookResult(BaseModel):
 class DatabaseOutput(BaseModel):
     books: list[BookResult]
 
-def weaviate_client():
-    # Don't hardcode credentials in your code like us. This is an example.
-    # The WCD API KEY is a read only API Key.
-    wcd_url = "https://4zfylktqsqkmqkougroa.c0.us-east1.gcp.weaviate.cloud" 
-    wcd_api_key = "UGbNHq95PEfuac6caJPFLBnMNLyzoIReZSIG" # READ ONLY API KEY
-    client = weaviate.connect_to_weaviate_cloud(
-        cluster_url=wcd_url,                                    # Replace with your Weaviate Cloud URL
-        auth_credentials=Auth.api_key(wcd_api_key),             # Replace with your Weaviate Cloud key
-        # headers={"X-OpenAI-Api-Key": openai_api_key},           # Replace with your Cohere API key
+class BatchQueryInput(BaseModel):
+    queries: list[str]
+
+class DatabaseBatchOutput(BaseModel):
+    # Every book found, once, even when several queries returned it
+    books: list[BookResult]
+    # For each query, the positions of its results in books
+    matches: list[list[int]]
+
+    def for_query(self, position: int) -> DatabaseOutput:
+        return DatabaseOutput(books=[self.books[i] for i in self.matches[position]])
+
+def merge_results(per_query: list[list[dict]]) -> tuple[list[dict], list[list[int]]]:
+    """
+    Deduplicate results shared between queries. Returns the distinct results
+    and, per query, the positions of its results among them.
+    """
+    distinct, positions, matches = [], {}, []
+    for results in per_query:
+        row = []
+        for result in results:
+            key = json.dumps(result, sort_keys=True)
+            if key not in positions:
+                positions[key] = len(distinct)
+                distinct.append(result)
+            row.append(positions[key])
+        matches.append(row)
+    return distinct, matches
+
+HYBRID_ALPHA = 0.5
+SEARCH_LIMIT = 2
+
+async def query_hybrid(query: str) -> dict:
+    client = await weaviate_client()
+    log.info("Hybrid search started")
+
+    questions = client.collections.get("BookVectorizedByWeaviateEmbeddings")
+
+    response = await questions.query.hybrid(
+        query=query,
+        alpha=HYBRID_ALPHA,
+        limit=SEARCH_LIMIT
     )
+    log.info(f"Response from Weaviate Cloud: {response}")
+    for obj in response.objects:
+        log.info(json.dumps(obj.properties, indent=2))
+
+    books = [
+        BookResult(
+            title=obj.properties.get('title'),
+            description=obj.properties.get('description')
+        )
+        for obj in response.objects
+    ]
     
-    # Best practice: store your credentials in environment variables
-    # wcd_url = os.environ["WCD_URL"]
-    # wcd_api_key = os.environ["WCD_API_KEY"]
-    return client
+    log.info(f"Hybrid search completed: {books}")
+    return DatabaseOutput(books=books).model_dump()
+
+async def query_semantic(query: str) -> dict:
+    client = await weaviate_client()
+    log.info("Semantic search started")
+
+    questions = client.collections.get("BookVectorizedByWeaviateEmbeddings")
+
+    response = await questions.query.near_text(
+        query=query,
+        limit=SEARCH_LIMIT
+    )
+    log.info(f"Response from Weaviate Cloud: {response}")
+    for obj in response.objects:
+        log.info(json.dumps(obj.properties, indent=2))
+
+    books = [
+        BookResult(
+            title=obj.properties.get('title'),
+            description=obj.properties.get('description')
+        )
+        for obj in response.objects
+    ]
+
+    return DatabaseOutput(books=books).model_dump()
+
+async def query_hybrid_local(query: str) -> dict:
+    books = [
+        BookResult(title=obj["title"], description=obj["description"])
+        for obj in await local_hybrid_search(query, HYBRID_ALPHA, SEARCH_LIMIT)
+    ]
+    return DatabaseOutput(books=books).model_dump()
+
+async def query_semantic_local(query: str) -> dict:
+    books = [
+        BookResult(title=obj["title"], description=obj["description"])
+        for obj in await local_vector_search(query, SEARCH_LIMIT)
+    ]
+    return DatabaseOutput(books=books).model_dump()
+
+async def cached_hybrid(query: str) -> dict:
+    compute = query_hybrid_local if SEARCH_BACKEND == "local" else query_hybrid
+    # Served from the cache, or shared with an identical search already running
+    return await search_cache.get_or_compute(
+        "hybrid_search", query,
+        lambda: compute(query),
+        alpha=HYBRID_ALPHA, limit=SEARCH_LIMIT, backend=SEARCH_BACKEND
+    )
+
+async def cached_semantic(query: str) -> dict:
+    compute = query_semantic_local if SEARCH_BACKEND == "local" else query_semantic
+    return await search_cache.get_or_compute(
+        "semantic_search", query,
+        lambda: compute(query),
+        limit=SEARCH_LIMIT, backend=SEARCH_BACKEND
+    )
+
+async def search_batch(search, queries: list[str]) -> DatabaseBatchOutput:
+    # All queries run concurrently over the worker's one Weaviate connection
+    outputs = await asyncio.gather(*(search(query) for query in queries))
+    books, matches = merge_results([output["books"] for output in outputs])
+    return DatabaseBatchOutput(books=books, matches=matches)
 
 @function.defn()
+@instrument
 async def hybrid_search(input: QueryInput) -> DatabaseOutput:
     try:
-        client = weaviate_client()
-        log.info(f"Client connected to Weaviate Cloud: {client} and hybrid search started")   
+        return DatabaseOutput.model_validate(await cached_hybrid(input.user_content))
 
-        questions = client.collections.get("BookVectorizedByWeaviateEmbeddings")
+    except Exception as e:
+        log.error("welcome function failed", error=e)
+        raise e
 
-        response = questions.query.hybrid(
-            query=input.user_content,
-            alpha=0.5,
-            limit=2
-        )
-        log.info(f"Response from Weaviate Cloud: {response}")
-        for obj in response.objects:
-            log.info(json.dumps(obj.properties, indent=2))
-
-        client.close()  # Free up resources
-        
-        books = [
-            BookResult(
-                title=obj.properties.get('title'),
-                description=obj.properties.get('description')
-            )
-            for obj in response.objects
-        ]
-        
-        log.info(f"Hybrid search completed: {books}")
-        return DatabaseOutput(books=books)
+@function.defn()
+@instrument
+async def semantic_search(input: QueryInput) -> DatabaseOutput:
+    try:
+        return DatabaseOutput.model_validate(await cached_semantic(input.user_content))
 
     except Exception as e:
         log.error("welcome function failed", error=e)
         raise e
 
 @function.defn()
-async def semantic_search(input: QueryInput) -> DatabaseOutput:
+@instrument
+async def hybrid_search_batch(input: BatchQueryInput) -> DatabaseBatchOutput:
+    """
+    hybrid_search for several queries in one function call.
+    """
     try:
-        client = weaviate_client()
-        log.info(f"Client connected to Weaviate Cloud: {client} and semantic search started")
+        return await search_batch(cached_hybrid, input.queries)
 
-        questions = client.collections.get("BookVectorizedByWeaviateEmbeddings")
+    except Exception as e:
+        log.error("hybrid_search_batch function failed", error=e)
+        raise e
 
-        response = questions.query.near_text(
-            query=input.user_content,
-            limit=2
-        )
-        log.info(f"Response from Weaviate Cloud: {response}")
-        for obj in response.objects:
-            log.info(json.dumps(obj.properties, indent=2))
-
-        client.close()  # Free up resources
-        
-        books = [
-            BookResult(
-                title=obj.properties.get('title'),
-                description=obj.properties.get('description')
-            )
-            for obj in response.objects
-        ]
-        
-        return DatabaseOutput(books=books)
+@function.defn()
+@instrument
+async def semantic_search_batch(input: BatchQueryInput) -> DatabaseBatchOutput:
+    """
+    semantic_search for several queries in one function call.
+    """
+    try:
+        return await search_batch(cached_semantic, input.queries)
 
     except Exception as e:
-        log.error("welcome function failed", error=e)
+        log.error("semantic_search_batch function failed", error=e)
         raise e
 
 ## Not best pratice, you can use pydantic to convert the funciton to a json schema
@@ -120,5 +206,17 @@ weaviate_tools = [
             },
             "required": ["user_content"]
         }
+    },
+    {
+        "name": "vector_similarity_search",
+        "description": "Finds relevant content using vector similarity search in Weaviate.",
+        "parameters": {
+            "type": "OBJECT",
+            "properties": {
+                "query": {"type": "STRING"},
+                "limit": {"type": "INTEGER"}
+            },
+            "required": ["query"]
+        }
     }
 ]
\ No newline at end of file
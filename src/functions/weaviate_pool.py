@@ -0,0 +1,133 @@
+import asyncio
+import os
+import time
+from typing import Optional
+from pydantic import BaseModel
+from restack_ai.function import log
+from src.functions.metrics import metrics
+
+# Don't hardcode credentials in your code like us. This is an example.
+# The WCD API KEY is a read only API Key.
+WCD_URL = os.environ.get("WCD_URL", "https://4zfylktqsqkmqkougroa.c0.us-east1.gcp.weaviate.cloud")
+WCD_API_KEY = os.environ.get("WCD_API_KEY", "UGbNHq95PEfuac6caJPFLBnMNLyzoIReZSIG")  # READ ONLY API KEY
+
+class WeaviatePoolStats(BaseModel):
+    open_connections: int = 0
+    connects: int = 0
+    reuse_count: int = 0
+    reconnects: int = 0
+    health_check_failures: int = 0
+
+async def connect_weaviate():
+    """
+    Open a new async connection to the Weaviate Cloud instance.
+    """
+    # Imported on first connect, only search workers pay for the SDK
+    import weaviate
+    from weaviate.classes.init import Auth
+
+    client = weaviate.use_async_with_weaviate_cloud(
+        cluster_url=WCD_URL,
+        auth_credentials=Auth.api_key(WCD_API_KEY),
+    )
+    await client.connect()
+    return client
+
+class WeaviatePool:
+    """
+    Keeps one long-lived async Weaviate client per worker process.
+
+    The client is created on first use, handed out to every function invocation
+    and replaced when a health check finds it stale.
+    """
+
+    def __init__(self, connect=connect_weaviate, health_check_interval: float = 30.0):
+        self.connect = connect
+        self.health_check_interval = health_check_interval
+        self._client = None
+        self._pid: Optional[int] = None
+        self._last_check = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._stats = WeaviatePoolStats()
+
+    async def acquire(self):
+        async with self._get_lock():
+            # A forked worker must not share the parent's sockets
+            if self._client is not None and self._pid != os.getpid():
+                self._client = None
+                self._stats.open_connections = 0
+
+            if self._client is None:
+                return await self._open()
+
+            if not await self._is_healthy():
+                self._stats.health_check_failures += 1
+                log.warning("Weaviate client is stale, reconnecting")
+                await self._discard()
+                self._stats.reconnects += 1
+                return await self._open()
+
+            self._stats.reuse_count += 1
+            return self._client
+
+    async def close(self):
+        async with self._get_lock():
+            await self._discard()
+
+    def stats(self) -> WeaviatePoolStats:
+        return self._stats.model_copy()
+
+    def _get_lock(self) -> asyncio.Lock:
+        # Created lazily so the lock binds to the worker's running loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _open(self):
+        with metrics.timed("weaviate_connect_seconds"):
+            self._client = await self.connect()
+        self._pid = os.getpid()
+        self._last_check = time.monotonic()
+        self._stats.connects += 1
+        self._stats.open_connections = 1
+        log.info(f"Connected to Weaviate Cloud: {self._client}")
+        return self._client
+
+    async def _discard(self):
+        if self._client is None:
+            return
+        try:
+            await self._client.close()
+        except Exception as e:
+            log.warning("Failed to close Weaviate client", error=e)
+        self._client = None
+        self._stats.open_connections = 0
+
+    async def _is_healthy(self) -> bool:
+        if not self._client.is_connected():
+            return False
+        now = time.monotonic()
+        if now - self._last_check < self.health_check_interval:
+            return True
+        self._last_check = now
+        try:
+            return await self._client.is_ready()
+        except Exception:
+            return False
+
+weaviate_pool = WeaviatePool(
+    health_check_interval=float(os.environ.get("WEAVIATE_HEALTH_CHECK_INTERVAL", "30")),
+)
+metrics.register_stats("weaviate_pool", weaviate_pool.stats)
+
+async def weaviate_client():
+    """
+    Return the shared async Weaviate client of this worker process.
+    """
+    return await weaviate_pool.acquire()
+
+def weaviate_pool_stats() -> WeaviatePoolStats:
+    return weaviate_pool.stats()
+
+async def close_weaviate_pool():
+    await weaviate_pool.close()
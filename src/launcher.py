@@ -0,0 +1,127 @@
+"""
+Run the workers as separate processes, each serving one task queue.
+
+    poetry run workers                                   # one process per queue
+    poetry run workers --processes braille=4 --processes search=2
+    poetry run workers --queues search,gemini --concurrency search=500
+
+Processes and concurrency per queue default to WORKER_PROCESSES_<QUEUE> and
+WORKER_CONCURRENCY_<QUEUE> (see src/queues.py). On SIGINT or SIGTERM every
+process stops taking tasks and gets --drain-timeout seconds to finish the
+functions it is running. A process that exits on its own is restarted.
+`poetry run services` and `poetry run dev` still serve every queue from one
+process.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import time
+from src.queues import TASK_QUEUES, queue_concurrency, queue_processes
+
+# Seconds before a process that exited is started again
+RESTART_DELAY = 5.0
+# Seconds a process gets after its drain timeout to close its clients
+SHUTDOWN_GRACE = 10.0
+
+def queue_count(value: str) -> tuple[str, int]:
+    queue, _, count = value.partition("=")
+    if queue not in TASK_QUEUES or not count.isdigit():
+        raise argparse.ArgumentTypeError(f"expected <queue>=<count> with a queue among {', '.join(TASK_QUEUES)}, got {value!r}")
+    return queue, int(count)
+
+def process_env(queue: str, index: int, slot: int, processes: dict[str, int]) -> dict[str, str]:
+    """
+    Settings of one worker process. Every process knows the process counts
+    (the gemini limiter splits the quota), and gets its own metrics port and file.
+    """
+    env = {f"WORKER_PROCESSES_{name.upper()}": str(count) for name, count in processes.items()}
+    if os.environ.get("METRICS_PORT", "0") != "0":
+        env["METRICS_PORT"] = str(int(os.environ["METRICS_PORT"]) + slot)
+    if os.environ.get("METRICS_FILE"):
+        root, extension = os.path.splitext(os.environ["METRICS_FILE"])
+        env["METRICS_FILE"] = f"{root}.{queue}-{index}{extension}"
+    return env
+
+def run_worker(queue: str, concurrency: int, drain_timeout: float, env: dict[str, str]):
+    # The launcher decides when to stop, until serve() installs its own handlers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.environ.update(env)
+    # Imported after the environment is set, modules read their settings at import
+    import asyncio
+    from src.services import serve
+
+    asyncio.run(serve([queue], {queue: concurrency}, drain_timeout))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queues", default=",".join(TASK_QUEUES), help="Comma separated task queues to serve")
+    parser.add_argument("--processes", type=queue_count, action="append", default=[], help="<queue>=<count>, repeatable")
+    parser.add_argument("--concurrency", type=queue_count, action="append", default=[], help="<queue>=<runs per process>, repeatable")
+    parser.add_argument("--drain-timeout", type=float, default=float(os.environ.get("WORKER_DRAIN_TIMEOUT", "30")),
+                        help="Seconds running functions get to finish on shutdown")
+    args = parser.parse_args()
+
+    queues = [queue for queue in args.queues.split(",") if queue]
+    unknown = set(queues) - set(TASK_QUEUES)
+    if unknown:
+        parser.error(f"unknown queues {', '.join(sorted(unknown))}")
+    processes = {queue: queue_processes(queue) for queue in queues} | dict(args.processes)
+    concurrency = {queue: queue_concurrency(queue) for queue in queues} | dict(args.concurrency)
+
+    # Fresh interpreters: no event loop or client connection is inherited
+    context = multiprocessing.get_context("spawn")
+    plan = [(queue, index) for queue in queues for index in range(processes.get(queue, 0))]
+    workers: dict[int, multiprocessing.Process] = {}
+    restart_at: dict[int, float] = {}
+
+    def start(slot: int):
+        queue, index = plan[slot]
+        worker = context.Process(
+            target=run_worker,
+            args=(queue, concurrency[queue], args.drain_timeout, process_env(queue, index, slot, processes)),
+            name=f"worker-{queue}-{index}",
+        )
+        worker.start()
+        workers[slot] = worker
+        print(f"Started {worker.name} (pid {worker.pid}, concurrency {concurrency[queue]})")
+
+    stopping = False
+
+    def stop(signal_number, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for slot in range(len(plan)):
+        start(slot)
+
+    while not stopping:
+        time.sleep(0.5)
+        now = time.monotonic()
+        for slot, worker in list(workers.items()):
+            if worker.is_alive() or stopping:
+                continue
+            if slot not in restart_at:
+                print(f"{worker.name} exited with code {worker.exitcode}, restarting in {RESTART_DELAY:g}s")
+                restart_at[slot] = now + RESTART_DELAY
+            elif now >= restart_at[slot]:
+                del restart_at[slot]
+                start(slot)
+
+    print(f"Stopping {len(workers)} workers, draining for up to {args.drain_timeout:g}s")
+    for worker in workers.values():
+        if worker.is_alive():
+            worker.terminate()
+    deadline = time.monotonic() + args.drain_timeout + SHUTDOWN_GRACE
+    for worker in workers.values():
+        worker.join(max(0.0, deadline - time.monotonic()))
+        if worker.is_alive():
+            print(f"{worker.name} did not stop in time, killing it")
+            worker.kill()
+            worker.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+
+# Task queues served by the workers. Workflows stay on "restack", the queue the
+# API starts them on; their steps name the queue of each function.
+TASK_QUEUES = ["restack", "search", "gemini", "braille", "audio"]
+
+# Runs one worker process takes at a time: workflow runs for "restack",
+# function runs for the others. Network-bound searches can overlap a lot,
+# Braille is CPU-bound so a busy process leaves its tasks to the others.
+DEFAULT_CONCURRENCY = {
+    "restack": 3000,
+    "search": 200,
+    "gemini": 50,
+    "braille": 4,
+    "audio": 8,
+}
+
+def queue_concurrency(queue: str) -> int:
+    """
+    Concurrency of a queue, WORKER_CONCURRENCY_<QUEUE> overrides the default.
+    """
+    return int(os.environ.get(f"WORKER_CONCURRENCY_{queue.upper()}", DEFAULT_CONCURRENCY[queue]))
+
+def queue_processes(queue: str) -> int:
+    """
+    Worker processes of a queue for the launcher, from WORKER_PROCESSES_<QUEUE> (default 1).
+    """
+    return int(os.environ.get(f"WORKER_PROCESSES_{queue.upper()}", "1"))
@@ -1,31 +1,161 @@
 import asyncio
+import importlib
 import os
-from src.functions.weaviate_functions import semantic_search, hybrid_search
-from src.functions.gemini_function_call import gemini_function_call
-from src.functions.vector_similarity_search import vector_similarity_search
-from src.functions.text_to_braille import text_to_braille
-from src.functions.text_to_audio import text_to_audio  # ✅ New Function
-from src.client import client
-from src.workflows.workflow import CurriculumWorkflow, BrailleWorkflow  # ✅ Workflows
-from watchfiles import run_process
+import signal
+import sys
+from datetime import timedelta
+from typing import Optional
+# Loads .env before the function modules read their settings
+from src.client import get_client
+from src.functions.gemini_rate_limit import GEMINI_REQUESTS_PER_MINUTE
+from src.functions.metrics import MetricsExporter
+from src.queues import TASK_QUEUES, queue_concurrency
+from temporalio.worker import Worker
+from watchfiles import PythonFilter, run_process
 from restack_ai.restack import ServiceOptions
 import webbrowser
 
+# What each task queue serves, see src/queues.py. Modules are imported when
+# their queue is served, so a worker process only loads what its queue needs.
+QUEUES = {
+    "restack": {
+        "workflows": ["src.workflows.workflow:CurriculumWorkflow", "src.workflows.workflow:BatchCurriculumWorkflow", "src.workflows.workflow:BrailleWorkflow"],  # ✅ Workflows
+        "functions": [],
+    },
+    "search": {
+        "workflows": [],
+        "functions": [
+            "src.functions.weaviate_functions:semantic_search",
+            "src.functions.weaviate_functions:hybrid_search",
+            "src.functions.vector_similarity_search:vector_similarity_search",
+            "src.functions.weaviate_functions:semantic_search_batch",
+            "src.functions.weaviate_functions:hybrid_search_batch",
+            "src.functions.vector_similarity_search:vector_similarity_search_batch",
+        ],
+    },
+    "gemini": {"workflows": [], "functions": ["src.functions.gemini_function_call:gemini_function_call"]},
+    "braille": {"workflows": [], "functions": ["src.functions.text_to_braille:text_to_braille", "src.functions.text_to_braille:text_to_braille_bulk"]},
+    "audio": {"workflows": [], "functions": ["src.functions.text_to_audio:text_to_audio"]},  # ✅ Added text_to_audio
+}
+
+# SDKs the functions of a queue import on first use. They are imported in the
+# background once the queue's worker is polling, so the worker starts without
+# waiting for them and its first task usually finds them loaded.
+QUEUE_SDKS = {
+    "search": ["weaviate", "weaviate.classes.init"],
+    "gemini": ["google.genai"],
+    "audio": ["google.genai"],
+}
+
+# Checks run before a queue's worker starts polling, it doesn't start when one fails
+QUEUE_CHECKS = {
+    "search": ["src.functions.vector_similarity_search:check_embedder"],
+}
+
+def load(path: str):
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+def queue_definitions(queue: str) -> dict[str, list]:
+    """
+    The workflows and functions of queue, importing their modules.
+    """
+    return {kind: [load(path) for path in paths] for kind, paths in QUEUES[queue].items()}
+
+async def preload_sdks(queues: list[str]):
+    modules = dict.fromkeys(module for queue in queues for module in QUEUE_SDKS.get(queue, []))
+    for module in modules:
+        try:
+            await asyncio.to_thread(importlib.import_module, module)
+        except ImportError as e:
+            # The function reports it when it is called
+            print(f"Failed to preload {module}: {e}")
+
+async def create_queue_service(queue: str, concurrency: Optional[int] = None, drain_timeout: float = 0) -> Worker:
+    for check in QUEUE_CHECKS.get(queue, []):
+        await load(check)()
+    concurrency = concurrency or queue_concurrency(queue)
+    options = ServiceOptions(max_concurrent_workflow_runs=concurrency, max_concurrent_function_runs=concurrency)
+    if queue == "gemini":
+        # Ceiling for the whole queue, the in-process limiter handles tokens and 429 backoff
+        options.rate_limit = GEMINI_REQUESTS_PER_MINUTE / 60
+    service = await get_client().create_service(task_queue=queue, options=options, **queue_definitions(queue))
+    if drain_timeout:
+        # Restack creates workers without a graceful shutdown timeout, so running
+        # functions would be cancelled at once. Same worker, with the timeout.
+        service = Worker(**{**service.config(), "graceful_shutdown_timeout": timedelta(seconds=drain_timeout)})
+    return service
+
+async def close_resources():
+    """
+    Print the stats of and close the caches, clients and pools this worker
+    used. Modules its queues never imported are left alone.
+    """
+    loaded = sys.modules.get
+    if pool := loaded("src.functions.weaviate_pool"):
+        # Release the shared Weaviate connection of this worker
+        print(f"Weaviate pool stats: {pool.weaviate_pool_stats().model_dump()}")
+        await pool.close_weaviate_pool()
+    if cache := loaded("src.functions.search_cache"):
+        print(f"Search cache stats: {(await cache.search_cache.stats()).model_dump()}")
+    if gemini := loaded("src.functions.gemini_function_call"):
+        gemini_stats = gemini.gemini_cache.stats()
+        print(f"Gemini cache stats: {gemini_stats.model_dump()} hit_rate={gemini_stats.hit_rate:.2%}")
+        gemini.gemini_cache.close()
+    if embeddings := loaded("src.functions.embeddings"):
+        embedding_cache = embeddings.embedding_cache
+        print(f"Embedding cache: hits={embedding_cache.hits} disk_hits={embedding_cache.disk_hits} misses={embedding_cache.misses}")
+        embedding_cache.close()
+    if genai_client := loaded("src.functions.genai_client"):
+        genai_client.close_genai_client()
+    if executor := loaded("src.functions.executor"):
+        executor.shutdown_blocking_executor()
+
+async def serve(queues: list[str], concurrency: Optional[dict[str, int]] = None, drain_timeout: float = 0):
+    """
+    Run the services of queues in this process until they fail or SIGINT /
+    SIGTERM. On a signal the workers stop polling and running functions get
+    drain_timeout seconds to finish before they are cancelled.
+    """
+    # Prometheus endpoint and/or metrics file, as configured by METRICS_PORT and METRICS_FILE
+    exporter = MetricsExporter()
+    exporter.start()
+    try:
+        concurrency = concurrency or {}
+        services = [await create_queue_service(queue, concurrency.get(queue), drain_timeout) for queue in queues]
+        client = get_client()
+        tasks = [asyncio.ensure_future(client.run_service(service)) for service in services]
+        preload = asyncio.ensure_future(preload_sdks(queues))
+
+        draining = False
+
+        def drain():
+            nonlocal draining
+            if draining:
+                return
+            draining = True
+            print(f"Draining {', '.join(queues)}, waiting up to {drain_timeout:g}s for running functions")
+            preload.cancel()
+            for task in tasks:
+                task.cancel()
+
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, drain)
+
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        failed = next((task for task in done if not task.cancelled() and task.exception()), None)
+        if failed is not None:
+            drain()
+            await asyncio.wait(tasks)
+            raise failed.exception()
+    finally:
+        await close_resources()
+        await exporter.close()
+
 async def main():
-    await asyncio.gather(
-        client.start_service(
-            workflows=[CurriculumWorkflow, BrailleWorkflow],
-            functions=[semantic_search, hybrid_search, vector_similarity_search, text_to_braille, text_to_audio]  # ✅ Added text_to_audio
-        ),
-        client.start_service(
-            functions=[gemini_function_call],
-            workflows=[],
-            options=ServiceOptions(
-                rate_limit=0.16,
-            ),
-            task_queue="gemini"
-        )
-    )
+    # Every queue in this one process, see src/launcher.py for one process per queue
+    await serve(TASK_QUEUES, drain_timeout=float(os.environ.get("WORKER_DRAIN_TIMEOUT", "0")))
 
 def run_services():
     try:
@@ -37,7 +167,9 @@ def watch_services():
     watch_path = os.getcwd()
     print(f"Watching {watch_path} and its subdirectories for changes...")
     webbrowser.open("http://localhost:5233")
-    run_process(watch_path, recursive=True, target=run_services)
+    # Only code and .env changes restart the services, not the caches and
+    # artifacts they write under the same directory
+    run_process(watch_path, recursive=True, target=run_services, watch_filter=PythonFilter(extra_extensions=(".env",)))
 
 if __name__ == "__main__":
        run_services()
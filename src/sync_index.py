@@ -0,0 +1,160 @@
+"""
+Snapshot the Weaviate book collection into a local index for SEARCH_BACKEND=local.
+
+    poetry run sync-index                              # vectors copied from Weaviate
+    poetry run sync-index --embedder hashing           # re-embedded locally
+    poetry run sync-index --source books.json --embedder hashing   # fully offline
+
+Runs are incremental: objects whose last update time is unchanged keep their
+vector from the previous snapshot, and only new or changed ones are fetched
+or embedded. --full rebuilds everything.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+from typing import Optional
+import numpy as np
+from src.functions.embeddings import DEFAULT_EMBEDDER, WEAVIATE_VECTOR_MODEL, get_embedder, normalize_rows
+from src.functions.local_index import LOCAL_INDEX_DIR, LocalIndex
+
+COLLECTION = "BookVectorizedByWeaviateEmbeddings"
+# --embedder value that copies the vectors Weaviate already computed
+WEAVIATE_VECTORS = "weaviate"
+FETCH_BATCH_SIZE = 100
+EMBED_BATCH_SIZE = 64
+
+async def fetch_weaviate_objects() -> list[dict]:
+    from weaviate.classes.query import MetadataQuery
+    from src.functions.weaviate_pool import connect_weaviate
+
+    client = await connect_weaviate()
+    try:
+        collection = client.collections.get(COLLECTION)
+        objects = []
+        async for obj in collection.iterator(
+            return_properties=["title", "description"],
+            return_metadata=MetadataQuery(last_update_time=True),
+        ):
+            updated = obj.metadata.last_update_time
+            objects.append({
+                "uuid": str(obj.uuid),
+                "title": obj.properties.get("title"),
+                "description": obj.properties.get("description"),
+                "updated": updated.isoformat() if updated else None,
+            })
+        return objects
+    finally:
+        await client.close()
+
+async def fetch_weaviate_vectors(uuids: list[str]) -> dict[str, list[float]]:
+    from weaviate.classes.query import Filter
+    from src.functions.weaviate_pool import connect_weaviate
+
+    client = await connect_weaviate()
+    try:
+        collection = client.collections.get(COLLECTION)
+        vectors = {}
+        for start in range(0, len(uuids), FETCH_BATCH_SIZE):
+            batch = uuids[start:start + FETCH_BATCH_SIZE]
+            response = await collection.query.fetch_objects(
+                filters=Filter.by_id().contains_any(batch),
+                include_vector=True,
+                limit=len(batch),
+            )
+            for obj in response.objects:
+                vectors[str(obj.uuid)] = obj.vector["default"]
+        return vectors
+    finally:
+        await client.close()
+
+def load_source_file(path: str) -> list[dict]:
+    """
+    Objects from a JSON list of {"title", "description"} (plus optional
+    "uuid" and "updated"), for building an index without Weaviate.
+    """
+    with open(path, encoding="utf-8") as source_file:
+        records = json.load(source_file)
+    objects = []
+    for record in records:
+        title, description = record.get("title"), record.get("description")
+        digest = hashlib.sha256(f"{title}\0{description}".encode()).hexdigest()
+        objects.append({
+            "uuid": record.get("uuid") or digest[:32],
+            "title": title,
+            "description": description,
+            # Without a timestamp a content change still counts as an update
+            "updated": record.get("updated") or digest,
+        })
+    return objects
+
+def embed_objects(embedder_name: str, objects: list[dict]) -> np.ndarray:
+    embedder = get_embedder(embedder_name)
+    texts = [f"{obj['title'] or ''}\n{obj['description'] or ''}" for obj in objects]
+    return np.concatenate([
+        embedder.embed(texts[start:start + EMBED_BATCH_SIZE])
+        for start in range(0, len(texts), EMBED_BATCH_SIZE)
+    ]) if texts else np.zeros((0, embedder.dimensions), dtype=np.float32)
+
+async def sync(directory: str, embedder: str, source: Optional[str] = None, full: bool = False) -> dict:
+    if source is not None and embedder == WEAVIATE_VECTORS:
+        raise ValueError("--source has no vectors, pick a local --embedder")
+    objects = load_source_file(source) if source else await fetch_weaviate_objects()
+    # Copied Weaviate vectors are queried with the model that produced them
+    model = WEAVIATE_VECTOR_MODEL if embedder == WEAVIATE_VECTORS else embedder
+
+    previous = None
+    if not full:
+        try:
+            previous = LocalIndex.load(directory)
+        except FileNotFoundError:
+            pass
+        if previous is not None and previous.embedder != model:
+            previous = None
+
+    rows: list[Optional[np.ndarray]] = []
+    changed = []
+    for obj in objects:
+        position = previous.position(obj["uuid"]) if previous is not None else None
+        if position is not None and previous.objects[position].get("updated") == obj["updated"] and obj["updated"]:
+            rows.append(np.asarray(previous.vectors[position]))
+        else:
+            rows.append(None)
+            changed.append(obj)
+
+    if changed:
+        if embedder == WEAVIATE_VECTORS:
+            remote = await fetch_weaviate_vectors([obj["uuid"] for obj in changed])
+            new_vectors = normalize_rows(np.asarray([remote[obj["uuid"]] for obj in changed], dtype=np.float32))
+        else:
+            new_vectors = embed_objects(embedder, changed)
+        fresh = iter(new_vectors)
+        rows = [row if row is not None else next(fresh) for row in rows]
+
+    dimensions = rows[0].shape[0] if rows else get_embedder(model).dimensions
+    vectors = np.stack(rows) if rows else np.zeros((0, dimensions), dtype=np.float32)
+    LocalIndex.write(directory, vectors, objects, model)
+    return {
+        "objects": len(objects),
+        "reused": len(objects) - len(changed),
+        "updated": len(changed),
+        "removed": len({obj["uuid"] for obj in previous.objects} - {obj["uuid"] for obj in objects}) if previous is not None else 0,
+        "embedder": model,
+        "directory": directory,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=LOCAL_INDEX_DIR, help="Index directory")
+    parser.add_argument(
+        "--embedder",
+        default=WEAVIATE_VECTORS if DEFAULT_EMBEDDER == WEAVIATE_VECTOR_MODEL else DEFAULT_EMBEDDER,
+        help=f"'{WEAVIATE_VECTORS}' to copy Weaviate's vectors, or a local embedder name",
+    )
+    parser.add_argument("--source", help="JSON file of books to index instead of the Weaviate collection")
+    parser.add_argument("--full", action="store_true", help="Re-fetch or re-embed every object")
+    args = parser.parse_args()
+    print(asyncio.run(sync(args.dir, args.embedder, args.source, args.full)))
+
+if __name__ == "__main__":
+    main()
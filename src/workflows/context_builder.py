@@ -0,0 +1,120 @@
+import json
+import re
+from pydantic import BaseModel
+
+# Words and punctuation, the units token counts are estimated from
+TOKEN_UNITS = re.compile(r"\w+|[^\w\s]")
+WORD = re.compile(r"\w+")
+# Reciprocal rank fusion constant, damps the weight of the first positions
+RRF_K = 60
+
+def count_tokens(text: str) -> int:
+    """
+    Local estimate of Gemini tokens: one per punctuation mark and per short
+    word, long words count one more per 8 characters. Close to the ~1.3
+    tokens per English word of SentencePiece without calling count_tokens.
+    """
+    return sum(1 + len(unit) // 8 for unit in TOKEN_UNITS.findall(text))
+
+def add_usage(totals: dict[str, int], usage: dict[str, int]) -> dict[str, int]:
+    for name, value in usage.items():
+        totals[name] = totals.get(name, 0) + value
+    return totals
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    Cut text at a word boundary so it fits in budget tokens.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    used, end = 0, 0
+    for match in TOKEN_UNITS.finditer(text):
+        used += 1 + len(match.group()) // 8
+        if used > budget - 1:
+            break
+        end = match.end()
+    return text[:end].rstrip() + "…"
+
+class RankedBook(BaseModel):
+    title: str
+    description: str = ""
+    score: float = 0.0
+    # How many tool results returned the book
+    hits: int = 0
+
+def books_from_tool_results(tool_results: list[str]) -> list[list[dict]]:
+    """
+    The books of each tool result, in their search order. Results are the
+    JSON of DatabaseOutput ({"books": [{title, description}]}) or of
+    VectorSearchOutput ({"results": [{title, content}]}).
+    """
+    lists = []
+    for result in tool_results:
+        try:
+            data = json.loads(result)
+        except (TypeError, ValueError):
+            continue
+        books = [
+            {"title": book.get("title") or "", "description": book.get("description") or ""}
+            for book in data.get("books") or []
+        ] + [
+            {"title": item.get("title") or "", "description": item.get("content") or ""}
+            for item in data.get("results") or []
+        ]
+        lists.append([book for book in books if book["title"]])
+    return lists
+
+def rank_books(tool_results: list[str], topic: str) -> list[RankedBook]:
+    """
+    Deduplicate the books of all tool results by title and rank them.
+
+    Books found by several searches and near the top of them rank first
+    (reciprocal rank fusion); words shared with the topic break ties.
+    """
+    topic_words = set(WORD.findall(topic.lower()))
+    books: dict[str, RankedBook] = {}
+    for results in books_from_tool_results(tool_results):
+        for position, book in enumerate(results):
+            key = " ".join(book["title"].lower().split())
+            ranked = books.setdefault(key, RankedBook(title=book["title"]))
+            ranked.score += 1 / (RRF_K + position + 1)
+            ranked.hits += 1
+            if len(book["description"]) > len(ranked.description):
+                ranked.description = book["description"]
+    for ranked in books.values():
+        if topic_words:
+            book_words = set(WORD.findall(f"{ranked.title} {ranked.description}".lower()))
+            ranked.score += 0.01 * len(topic_words & book_words) / len(topic_words)
+    return sorted(books.values(), key=lambda book: (-book.score, book.title))
+
+def build_books_context(books: list[RankedBook], budget: int, max_description_tokens: int = 120) -> str:
+    """
+    One line per book, best first, until budget tokens are used. Each
+    description gets at most an even share of the budget.
+    """
+    if not books:
+        return "no books found"
+    share = max(20, min(max_description_tokens, budget // len(books)))
+    lines, used = [], 0
+    for book in books:
+        line = f"- {book.title}: {truncate_to_tokens(book.description, share)}" if book.description else f"- {book.title}"
+        tokens = count_tokens(line)
+        if lines and used + tokens > budget:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines)
+
+def compact_curriculum(curriculum: dict, budget: int) -> str:
+    """
+    What a summary needs of a curriculum: its title, level, duration, a short
+    description and the module titles.
+    """
+    if not curriculum:
+        return "no curriculum"
+    lines = [
+        f"{curriculum.get('title', '')} ({curriculum.get('difficulty_level', '')}, {curriculum.get('estimated_duration', '')})",
+        truncate_to_tokens(curriculum.get("description", ""), max(10, budget // 3)),
+        "Modules: " + "; ".join(module.get("title", "") for module in curriculum.get("modules") or []),
+    ]
+    return truncate_to_tokens("\n".join(line for line in lines if line), budget)
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable
+
+class StepGraph:
+    """
+    Runs workflow steps as a dependency graph.
+
+    Each step starts as soon as all of its dependencies are done, so independent
+    branches run concurrently. Timings use the event loop clock, which inside a
+    workflow is the deterministic workflow time.
+    """
+
+    def __init__(self):
+        self._steps: dict[str, tuple[Callable[[dict], Awaitable[Any]], tuple[str, ...]]] = {}
+
+    def add(self, name: str, run: Callable[[dict], Awaitable[Any]], depends_on: Iterable[str] = ()):
+        """
+        Register a step. `run` receives a dict with the results of its dependencies.
+        """
+        depends_on = tuple(depends_on)
+        for dependency in depends_on:
+            if dependency not in self._steps:
+                raise ValueError(f"Step {name} depends on unknown step {dependency}")
+        self._steps[name] = (run, depends_on)
+
+    async def run(self) -> tuple[dict[str, Any], dict[str, dict]]:
+        """
+        Run every step and return (results, timings) keyed by step name.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks: dict[str, asyncio.Task] = {}
+        timings: dict[str, dict] = {}
+
+        async def run_step(name, run, depends_on):
+            results = {}
+            for dependency in depends_on:
+                results[dependency] = await tasks[dependency]
+            step_start = loop.time()
+            result = await run(results)
+            step_end = loop.time()
+            timings[name] = {
+                "start": round(step_start - started, 3),
+                "end": round(step_end - started, 3),
+                "duration": round(step_end - step_start, 3),
+            }
+            return result
+
+        # Steps are registered after their dependencies, so creation order is a topological order
+        for name, (run, depends_on) in self._steps.items():
+            tasks[name] = asyncio.ensure_future(run_step(name, run, depends_on))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}, timings
+
+    def critical_path(self, timings: dict[str, dict]) -> list[str]:
+        """
+        Walk back from the last step to finish through its slowest dependency.
+        """
+        if not timings:
+            return []
+        name = max(timings, key=lambda step: timings[step]["end"])
+        path = [name]
+        while self._steps[name][1]:
+            name = max(self._steps[name][1], key=lambda step: timings[step]["end"])
+            path.append(name)
+        return list(reversed(path))
@@ -0,0 +1,38 @@
+import time
+from temporalio import workflow as temporal_workflow
+from restack_ai.workflow import workflow, workflow_info
+from src.functions.metrics import metrics, span
+
+def replaying() -> bool:
+    try:
+        return temporal_workflow.unsafe.is_replaying()
+    except Exception:
+        # Not inside a workflow, e.g. steps run in-process by a benchmark
+        return False
+
+async def timed_step(function, **options):
+    """
+    workflow.step, recording how long the step took as seen by the workflow:
+    scheduling, queueing, execution and transferring its payloads. Workflows
+    run unsandboxed in the worker process, so this records into the same
+    registry as the functions. Replayed steps return from history at once and
+    are not recorded.
+    """
+    try:
+        labels = {"workflow": workflow_info().workflow_type}
+    except Exception:
+        labels = {"workflow": ""}
+    labels.update(step=function.__name__, task_queue=options.get("task_queue", "restack"))
+
+    if replaying():
+        return await workflow.step(function, **options)
+
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with span(f"step {function.__name__}", **labels):
+            result = await workflow.step(function, **options)
+        outcome = "ok"
+        return result
+    finally:
+        metrics.observe("workflow_step_seconds", time.perf_counter() - start, outcome=outcome, **labels)
@@ -0,0 +1,191 @@
+import asyncio
+import json
+from datetime import timedelta
+from pydantic import ValidationError
+from restack_ai.workflow import import_functions, log, RetryPolicy
+from src.workflows.context_builder import add_usage
+from src.workflows.step_metrics import timed_step
+
+with import_functions():
+    from src.functions.weaviate_functions import semantic_search, hybrid_search, semantic_search_batch, hybrid_search_batch, QueryInput, BatchQueryInput
+    from src.functions.gemini_function_call import gemini_function_call, FunctionInputParams, ChatMessage, FunctionCall, FunctionResponse
+    from src.functions.vector_similarity_search import vector_similarity_search, vector_similarity_search_batch, VectorSearchInput, VectorSearchBatchInput
+
+# Functions Gemini can call, keyed by their name in weaviate_tools
+TOOL_FUNCTIONS = {
+    "hybrid_search": (hybrid_search, QueryInput),
+    "semantic_search": (semantic_search, QueryInput),
+    "vector_similarity_search": (vector_similarity_search, VectorSearchInput),
+}
+
+# Batch variants, with the argument that becomes their list of queries.
+# Calls to the same tool whose other arguments match share one batch step.
+TOOL_BATCH_FUNCTIONS = {
+    "hybrid_search": (hybrid_search_batch, BatchQueryInput, "user_content"),
+    "semantic_search": (semantic_search_batch, BatchQueryInput, "user_content"),
+    "vector_similarity_search": (vector_similarity_search_batch, VectorSearchBatchInput, "query"),
+}
+
+def extract_function_calls(response) -> list[dict]:
+    """
+    The function calls Gemini asked for, as {"name", "args"} dicts.
+    """
+    return [call.model_dump() for call in response.function_calls]
+
+def tool_call_error(call: dict) -> str:
+    """
+    Why call can't run, or "" when its arguments fit the tool's input. Checked
+    before grouping, so a malformed call can't fail the batch step it would
+    share with valid ones.
+    """
+    if call["name"] not in TOOL_FUNCTIONS:
+        return "unknown tool"
+    _, input_model = TOOL_FUNCTIONS[call["name"]]
+    try:
+        input_model(**call["args"])
+    except ValidationError as e:
+        problems = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+        return f"invalid arguments {call['args']} ({problems})"
+    except TypeError as e:
+        return f"invalid arguments {call['args']} ({e})"
+    return ""
+
+def tool_call_key(call: dict) -> str:
+    return f"{call['name']}:{json.dumps(call['args'], sort_keys=True)}"
+
+async def execute_tool_call(call: dict) -> str:
+    function, input_model = TOOL_FUNCTIONS[call["name"]]
+    result = await timed_step(
+        function,
+        input=input_model(**call["args"]),
+        start_to_close_timeout=timedelta(seconds=60),
+        retry_policy=RetryPolicy(maximum_attempts=1),
+        task_queue="search"
+    )
+    return result.model_dump_json()
+
+def batch_group(call: dict) -> str:
+    if call["name"] not in TOOL_BATCH_FUNCTIONS:
+        return tool_call_key(call)
+    query_field = TOOL_BATCH_FUNCTIONS[call["name"]][2]
+    shared_args = {name: value for name, value in call["args"].items() if name != query_field}
+    return f"{call['name']}:{json.dumps(shared_args, sort_keys=True)}"
+
+async def execute_tool_group(calls: dict[str, dict]) -> dict[str, str]:
+    """
+    Run calls to the same tool, as one batch step when there are several.
+    Returns each call's result keyed like calls.
+    """
+    if len(calls) == 1:
+        key, call = next(iter(calls.items()))
+        return {key: await execute_tool_call(call)}
+
+    first = next(iter(calls.values()))
+    function, input_model, query_field = TOOL_BATCH_FUNCTIONS[first["name"]]
+    shared_args = {name: value for name, value in first["args"].items() if name != query_field}
+    result = await timed_step(
+        function,
+        input=input_model(queries=[call["args"].get(query_field) for call in calls.values()], **shared_args),
+        start_to_close_timeout=timedelta(seconds=60),
+        retry_policy=RetryPolicy(maximum_attempts=1),
+        task_queue="search"
+    )
+    return {key: result.for_query(position).model_dump_json() for position, key in enumerate(calls)}
+
+def tool_response(key: str, tool_results: dict[str, str], errors: dict[str, str]) -> dict:
+    """
+    What Gemini gets back for the call with key: the tool's result, or why
+    there is none.
+    """
+    if key in errors:
+        return {"error": errors[key]}
+    if key not in tool_results:
+        return {"error": "the call failed or timed out"}
+    return json.loads(tool_results[key])
+
+async def run_tool_loop(
+    user_content: str,
+    max_rounds: int = 3,
+    round_timeout: timedelta = timedelta(seconds=60),
+    tool_results: dict[str, str] = None,
+    token_usage: dict[str, int] = None,
+) -> list[str]:
+    """
+    Let Gemini call the search tools until it stops asking or max_rounds is hit.
+
+    All function calls of a round run concurrently as workflow steps and
+    identical calls (same name and arguments) only run once. Several searches
+    of the same kind go through one batch step. Calls still running when the
+    round times out are cancelled. Gemini gets the results back as function
+    responses, one per call it made. Returns the tool results in the order
+    they were first requested. The token usage of the Gemini calls is added
+    to token_usage.
+    """
+    tool_results = {} if tool_results is None else tool_results
+    token_usage = {} if token_usage is None else token_usage
+    requested: list[str] = []
+    messages: list[ChatMessage] = []
+    prompt = user_content
+    function_responses: list[FunctionResponse] = []
+
+    for round_number in range(1, max_rounds + 1):
+        response = await timed_step(
+            gemini_function_call,
+            input=FunctionInputParams(
+                user_content=prompt,
+                messages=messages,
+                function_responses=function_responses,
+                tools=True,
+                structured_output=False
+            ),
+            start_to_close_timeout=timedelta(seconds=120),
+            retry_policy=RetryPolicy(maximum_attempts=1),
+            task_queue="gemini"
+        )
+        add_usage(token_usage, response.usage.model_dump())
+
+        function_calls = extract_function_calls(response)
+        calls, errors = {}, {}
+        for call in function_calls:
+            error = tool_call_error(call)
+            if error:
+                log.warning(f"Skipping Gemini's call to {call['name']}: {error}")
+                errors[tool_call_key(call)] = error
+                continue
+            calls.setdefault(tool_call_key(call), call)
+        if not calls:
+            break
+
+        pending_calls = {key: call for key, call in calls.items() if key not in tool_results}
+        log.info(f"Tool round {round_number}: {len(calls)} calls, {len(pending_calls)} new")
+
+        if pending_calls:
+            groups: dict[str, dict[str, dict]] = {}
+            for key, call in pending_calls.items():
+                groups.setdefault(batch_group(call), {})[key] = call
+            tasks = [(asyncio.ensure_future(execute_tool_group(group)), group) for group in groups.values()]
+            done, pending = await asyncio.wait([task for task, _ in tasks], timeout=round_timeout.total_seconds())
+            for task in pending:
+                task.cancel()
+            for task, group in tasks:
+                if task in done and task.exception() is None:
+                    tool_results.update(task.result())
+                else:
+                    log.warning(f"Tool calls {', '.join(group)} failed or timed out")
+
+        for key in calls:
+            if key in tool_results and key not in requested:
+                requested.append(key)
+
+        # Every call Gemini made gets its response, in the order of the calls
+        messages = messages + [
+            ChatMessage(role="user", content=prompt, function_responses=function_responses),
+            ChatMessage(role="model", function_calls=[FunctionCall(**call) for call in function_calls]),
+        ]
+        function_responses = [
+            FunctionResponse(name=call["name"], response=tool_response(tool_call_key(call), tool_results, errors))
+            for call in function_calls
+        ]
+        prompt = "Call the tools again if you need more books, otherwise answer without calling tools."
+
+    return [tool_results[key] for key in requested]
@@ -1,7 +1,8 @@
 from datetime import timedelta
 from pydantic import BaseModel, Field
-import json
-from restack_ai.workflow import workflow, import_functions, log, RetryPolicy
+from typing import List
+import asyncio
+from restack_ai.workflow import workflow, import_functions, log, RetryPolicy, workflow_info
 
 with import_functions():
     from src.functions.weaviate_functions import semantic_search, hybrid_search, QueryInput
@@ -9,92 +10,140 @@ with import_functions():
     from src.functions.vector_similarity_search import vector_similarity_search
     from src.functions.text_to_braille import text_to_braille, BrailleInput
     from src.functions.text_to_audio import text_to_audio, AudioInput  # ✅ Import new function
+from src.workflows.tool_loop import run_tool_loop
+from src.workflows.step_graph import StepGraph
+from src.workflows.step_metrics import timed_step
+from src.workflows.context_builder import add_usage, build_books_context, compact_curriculum, count_tokens, rank_books
 
 class CurriculumInput(BaseModel):
     user_content: str = Field(default="I want to learn about coding with Python")
+    max_tool_rounds: int = Field(default=3)
+    tool_round_timeout_seconds: int = Field(default=60)
+    stream_curriculum: bool = Field(default=True)
+    # Token budgets for the context sent to the curriculum and summary prompts
+    curriculum_context_tokens: int = Field(default=2000)
+    summary_context_tokens: int = Field(default=300)
 
 @workflow.defn()
 class CurriculumWorkflow:
+    def __init__(self):
+        self.modules = []
+        # Tokens used per step, prompt_tokens_estimated is our local count of the prompt
+        self.token_usage = {}
+
+    # Called by gemini_function_call for each module of a streamed curriculum
+    @workflow.event
+    async def curriculum_module(self, module: dict):
+        self.modules.append(module)
+        return len(self.modules)
+
+    @workflow.memory
+    def progress(self) -> dict:
+        return {"modules": self.modules, "token_usage": self.token_usage}
+
     @workflow.run
     async def run(self, input: CurriculumInput):
         try:
-            function_results = []
             log.info("CurriculumWorkflow started")
-
-            # Step 1: Use Gemini to generate curriculum ideas
-            response = await workflow.step(
-                gemini_function_call, 
-                input=FunctionInputParams(
-                    user_content=input.user_content + ". You are a helpful assistant, you have to use tools to search for books and create a curriculum for a user to learn about a topic", 
-                    tools=True, 
-                    structured_output=False
-                ), 
-                start_to_close_timeout=timedelta(seconds=120), 
-                retry_policy=RetryPolicy(maximum_attempts=1), 
-                task_queue="gemini"
-            )
+            graph = StepGraph()
+
+            # Step 1: Let Gemini search for books, running its tool calls in parallel
+            async def search_books(results):
+                function_results = await run_tool_loop(
+                    user_content=input.user_content + ". You are a helpful assistant, you have to use tools to search for books and create a curriculum for a user to learn about a topic",
+                    max_rounds=input.max_tool_rounds,
+                    round_timeout=timedelta(seconds=input.tool_round_timeout_seconds),
+                    token_usage=self.token_usage.setdefault("search_books", {}),
+                )
+                log.info(f"Tool loop returned {len(function_results)} results")
+                return function_results
 
             # Step 2: Generate the final curriculum based on search results
-            curriculum = await workflow.step(
-                gemini_function_call, 
-                input=FunctionInputParams(
-                    user_content=f"Based on these results: {'; '.join(function_results)}, give me a curriculum for the user to learn about the topic. The curriculum should be a list of books that the user should read to learn about the topic.", 
-                    tools=False, 
-                    structured_output=True
-                ), 
-                start_to_close_timeout=timedelta(seconds=120), 
-                retry_policy=RetryPolicy(maximum_attempts=1), 
-                task_queue="gemini"
-            )
+            async def generate_curriculum(results):
+                # Each book once, best ranked first, cut to the step's token budget
+                books = rank_books(results["search_books"], input.user_content)
+                context = build_books_context(books, input.curriculum_context_tokens)
+                prompt = f"Based on these books:\n{context}\nGive me a curriculum for the user to learn about the topic: {input.user_content}. The curriculum should be a list of books that the user should read to learn about the topic."
+                curriculum = await timed_step(
+                    gemini_function_call, 
+                    input=FunctionInputParams(
+                        user_content=prompt, 
+                        tools=False, 
+                        structured_output=True,
+                        stream=input.stream_curriculum
+                    ), 
+                    start_to_close_timeout=timedelta(seconds=120), 
+                    retry_policy=RetryPolicy(maximum_attempts=1), 
+                    task_queue="gemini"
+                )
+                self.token_usage["generate_curriculum"] = add_usage(
+                    {"prompt_tokens_estimated": count_tokens(prompt), "books": len(books)}, curriculum.usage.model_dump()
+                )
+                return curriculum
 
             # Step 3: Generate a summary for the curriculum
-            summary = await workflow.step(
-                gemini_function_call, 
-                input=FunctionInputParams(
-                    user_content=f"Make a two-sentence summary for an audio ad of the following curriculum: {json.dumps(curriculum)}", 
-                    tools=False, 
-                    structured_output=False
-                ), 
-                start_to_close_timeout=timedelta(seconds=120), 
-                retry_policy=RetryPolicy(maximum_attempts=1), 
-                task_queue="gemini"
-            )
-
-            # ✅ Extract only the text content from the Gemini response
-            if isinstance(summary, dict) and "candidates" in summary:
-                for candidate in summary["candidates"]:
-                    for part in candidate.get("content", {}).get("parts", []):
-                        if isinstance(part, str):  # Ensure it's plain text
-                            summary_text = part
-                            break  # Stop at the first valid text result
-                else:
-                    summary_text = json.dumps(summary)  # Fallback: Convert dict to string
-            else:
-                summary_text = str(summary)  # Ensure it’s a string
+            async def summarize(results):
+                # Title, level and module titles are enough for a two-sentence ad
+                prompt = f"Make a two-sentence summary for an audio ad of the following curriculum: {compact_curriculum(results['generate_curriculum'].parsed, input.summary_context_tokens)}"
+                summary = await timed_step(
+                    gemini_function_call, 
+                    input=FunctionInputParams(
+                        user_content=prompt, 
+                        tools=False, 
+                        structured_output=False
+                    ), 
+                    start_to_close_timeout=timedelta(seconds=120), 
+                    retry_policy=RetryPolicy(maximum_attempts=1), 
+                    task_queue="gemini"
+                )
+
+                self.token_usage["summarize"] = add_usage(
+                    {"prompt_tokens_estimated": count_tokens(prompt)}, summary.usage.model_dump()
+                )
+                return summary.text.strip()
 
             # Step 4: Convert the summary to Braille
-            braille_output = await workflow.step(
-                text_to_braille,
-                input=BrailleInput(text=summary_text),  # ✅ Now always passing a string
-                start_to_close_timeout=timedelta(seconds=10),
-                retry_policy=RetryPolicy(maximum_attempts=1)
-            )
+            async def to_braille(results):
+                return await timed_step(
+                    text_to_braille,
+                    input=BrailleInput(text=results["summarize"]),  # ✅ Now always passing a string
+                    start_to_close_timeout=timedelta(seconds=10),
+                    retry_policy=RetryPolicy(maximum_attempts=1),
+                    task_queue="braille"
+                )
 
             # Step 5: Convert summary to Audio
-            audio_output = await workflow.step(
-                text_to_audio,
-                input=AudioInput(text=summary_text),  # ✅ New step
-                start_to_close_timeout=timedelta(seconds=30),
-                retry_policy=RetryPolicy(maximum_attempts=1)
-            )
+            async def to_audio(results):
+                return await timed_step(
+                    text_to_audio,
+                    input=AudioInput(text=results["summarize"]),  # ✅ New step
+                    start_to_close_timeout=timedelta(seconds=30),
+                    retry_policy=RetryPolicy(maximum_attempts=1),
+                    task_queue="audio"
+                )
+
+            graph.add("search_books", search_books)
+            graph.add("generate_curriculum", generate_curriculum, depends_on=["search_books"])
+            graph.add("summarize", summarize, depends_on=["generate_curriculum"])
+            # Braille and audio only need the summary, so they run side by side
+            graph.add("to_braille", to_braille, depends_on=["summarize"])
+            graph.add("to_audio", to_audio, depends_on=["summarize"])
+
+            results, timings = await graph.run()
+            curriculum = results["generate_curriculum"]
+            braille_output = results["to_braille"]
+            audio_output = results["to_audio"]
 
             log.info(f"Braille Output: {braille_output.braille_text}")
             log.info(f"Audio Output File: {audio_output.audio_file}")
 
             return {
-                "curriculum": curriculum["parsed"],
+                "curriculum": curriculum.parsed,
                 "braille_summary": braille_output.braille_text,
-                "audio_summary": audio_output.audio_file  # ✅ Includes audio file
+                "audio_summary": audio_output.audio_file,  # ✅ Includes audio file
+                "timings": timings,
+                "critical_path": graph.critical_path(timings),
+                "token_usage": self.token_usage
             }
 
         except Exception as e:
@@ -102,6 +151,55 @@ class CurriculumWorkflow:
             raise e
 
 
+class BatchCurriculumInput(BaseModel):
+    topics: List[CurriculumInput] = Field(default_factory=lambda: [CurriculumInput()])
+    max_concurrency: int = Field(default=4)
+
+@workflow.defn()
+class BatchCurriculumWorkflow:
+    """
+    Generate a curriculum for every topic, each as a child CurriculumWorkflow.
+
+    At most max_concurrency children run at a time. A failed topic is recorded
+    and does not stop the others. Identical searches across topics are served
+    once by the search cache of the function workers.
+    """
+
+    def __init__(self):
+        self.results = {}
+
+    # Results of the topics finished so far, readable while the batch runs
+    @workflow.memory
+    def progress(self) -> dict:
+        return {"completed": len(self.results), "results": self.results}
+
+    @workflow.run
+    async def run(self, input: BatchCurriculumInput):
+        log.info(f"BatchCurriculumWorkflow started with {len(input.topics)} topics")
+        semaphore = asyncio.Semaphore(max(1, input.max_concurrency))
+        batch_id = workflow_info().workflow_id
+
+        async def run_topic(index: int, topic: CurriculumInput):
+            async with semaphore:
+                try:
+                    result = await workflow.child_execute(
+                        CurriculumWorkflow,
+                        workflow_id=f"{batch_id}-topic-{index}",
+                        input=topic
+                    )
+                    self.results[str(index)] = {"topic": topic.user_content, "result": result}
+                except Exception as e:
+                    log.error(f"Topic {index} failed: {e}")
+                    self.results[str(index)] = {"topic": topic.user_content, "error": str(e)}
+
+        await asyncio.gather(*(run_topic(index, topic) for index, topic in enumerate(input.topics)))
+
+        results = [self.results[str(index)] for index in range(len(input.topics))]
+        failed = sum(1 for result in results if "error" in result)
+        log.info(f"BatchCurriculumWorkflow finished, {failed} of {len(results)} topics failed")
+        return {"results": results, "failed": failed}
+
+
 ### ✅ NEW: Define a separate Braille workflow
 class BrailleWorkflowInput(BaseModel):
     text: str = Field(default="Hello, how are you?")
@@ -117,11 +215,12 @@ class BrailleWorkflow:
             text_input = str(input.text)
 
             # Convert text to Braille
-            braille_output = await workflow.step(
+            braille_output = await timed_step(
                 text_to_braille,
                 input=BrailleInput(text=text_input),
                 start_to_close_timeout=timedelta(seconds=10),
-                retry_policy=RetryPolicy(maximum_attempts=1)
+                retry_policy=RetryPolicy(maximum_attempts=1),
+                task_queue="braille"
             )
 
             log.info(f"Braille Output: {braille_output.braille_text}")
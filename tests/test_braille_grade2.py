@@ -0,0 +1,150 @@
+import asyncio
+import re
+import time
+import pytest
+from src.functions.braille_grade2 import ContractionTable, load_contraction_table, translate_grade2
+from src.functions.text_to_braille import BrailleInput, text_to_braille, translate_grade1
+
+PROSE = (
+    "The children should have enough knowledge about the people of the nation. "
+    "Reading together every morning, they went through 1,000 pages in 3.5 weeks "
+    "and found that the thinking behind each chapter was much greater than they thought."
+)
+
+@pytest.mark.parametrize("word, braille", [
+    ("the", "⠮"),
+    ("and", "⠯"),
+    ("about", "⠁⠃"),
+    ("knowledge", "⠅"),
+    ("children", "⠡⠝"),
+    ("you", "⠽"),
+])
+def test_wordsigns(word, braille):
+    assert translate_grade2(word) == braille
+
+@pytest.mark.parametrize("word, braille", [
+    ("thing", "⠹⠬"),
+    ("bread", "⠃⠗⠂⠙"),
+    ("nation", "⠝⠠⠝"),
+    ("shower", "⠩⠪⠻"),
+    ("ebbs", "⠑⠆⠎"),
+])
+def test_groupsigns(word, braille):
+    assert translate_grade2(word) == braille
+
+def test_longest_groupsign_wins():
+    # "ation" over "at" + "ion" / "tion"
+    assert translate_grade2("station") == "⠌⠠⠝"
+
+@pytest.mark.parametrize("word, braille", [
+    # ing, ea and ation can't start a word
+    ("ingrown", "⠔⠛⠗⠪⠝"),
+    ("ease", "⠑⠁⠎⠑"),
+    ("ationx", "⠁⠰⠝⠭"),
+])
+def test_not_initial(word, braille):
+    assert translate_grade2(word) == braille
+
+@pytest.mark.parametrize("word, braille", [
+    # bb and ea can't end a word, but can stand inside one
+    ("ebb", "⠑⠃⠃"),
+    ("tea", "⠞⠑⠁"),
+    ("ebbs", "⠑⠆⠎"),
+])
+def test_not_final(word, braille):
+    assert translate_grade2(word) == braille
+
+@pytest.mark.parametrize("text, braille", [
+    ("The", "⠠⠮"),
+    ("THE", "⠠⠠⠮"),
+    ("ABOUT", "⠠⠠⠁⠃"),
+    ("I", "⠠⠊"),
+    # Mixed case: capitals marked one by one and no wordsign
+    ("MacDonald", "⠠⠍⠁⠉⠠⠙⠕⠝⠁⠇⠙"),
+])
+def test_capital_indicators(text, braille):
+    assert translate_grade2(text) == braille
+
+@pytest.mark.parametrize("text, braille", [
+    ("7", "⠼⠛"),
+    ("42", "⠼⠙⠃"),
+    ("1,000", "⠼⠁⠂⠚⠚⠚"),
+    ("3.5", "⠼⠉⠲⠑"),
+    ("3 and 4", "⠼⠉ ⠯ ⠼⠙"),
+])
+def test_number_indicator(text, braille):
+    assert translate_grade2(text) == braille
+
+def test_numbers_are_one_run():
+    # One numeric indicator per number, separators included
+    assert translate_grade2("1,000").count("⠼") == 1
+    assert translate_grade2("3.5").count("⠼") == 1
+
+@pytest.mark.parametrize("text, braille", [
+    # a-j after a digit would read as another digit
+    ("5a", "⠼⠑⠰⠁"),
+    # Letters after the indicator are spelled out, not contracted
+    ("3and", "⠼⠉⠰⠁⠝⠙"),
+    ("4ever", "⠼⠙⠰⠑⠧⠑⠗"),
+    # k-z can't be read as digits, they need no indicator and are contracted
+    ("2nd", "⠼⠃⠝⠙"),
+    ("1st", "⠼⠁⠌"),
+])
+def test_grade1_indicator_after_digit(text, braille):
+    assert translate_grade2(text) == braille
+
+def test_single_letters():
+    # Standing alone, letters other than a, i and o would read as wordsigns
+    assert translate_grade2("a") == "⠁"
+    assert translate_grade2("b") == "⠰⠃"
+    assert translate_grade2("x") == "⠰⠭"
+
+def test_punctuation_and_spacing():
+    assert translate_grade2("the end.") == "⠮ ⠢⠙⠲"
+    assert translate_grade2("Hello,\nworld!") == "⠠⠓⠑⠇⠇⠕⠂\n⠺⠕⠗⠇⠙⠖"
+
+def test_no_contractions_matches_grade1():
+    for text in ("xyz", "My zip: 90210", "Kim's pixy"):
+        assert translate_grade2(text) == translate_grade1(text)
+
+def test_grade2_not_longer_than_grade1():
+    words = set(re.findall(r"[A-Za-z]+(?:'[A-Za-z]+)*", PROSE))
+    for word in words:
+        if len(word) > 1:
+            assert len(translate_grade2(word)) <= len(translate_grade1(word)), word
+    assert len(translate_grade2(PROSE)) < 0.8 * len(translate_grade1(PROSE))
+
+def test_words_line_up_with_grade1():
+    # Contractions only shorten words, the text keeps its words and full stops
+    grade1, grade2 = translate_grade1(PROSE).split(" "), translate_grade2(PROSE).split(" ")
+    assert len(grade2) == len(grade1)
+    assert [word.endswith("⠲") for word in grade2] == [word.endswith("⠲") for word in grade1]
+
+def test_custom_table():
+    table = ContractionTable(wordsigns={"cat": "⠉"}, groupsigns={"ca": "⠿", "ts": "⠾"}, not_initial={"ts"}, not_final={"ca"})
+    assert table.contract_word("cat") == "⠉"
+    assert table.contract_word("cats") == "⠿⠾"
+    assert table.contract_word("tsca") == "⠞⠎⠉⠁"
+    assert table.contract_word("bats") == "⠃⠁⠾"
+
+def test_table_loaded_once():
+    assert load_contraction_table() is load_contraction_table()
+
+def test_throughput_against_grade1():
+    # Loose bounds, the trie and the per-word cache keep grade 2 within a few times grade 1
+    document = "\n".join([PROSE] * 1000)
+    translate_grade2(PROSE)
+
+    start = time.perf_counter()
+    translate_grade1(document)
+    grade1 = time.perf_counter() - start
+    start = time.perf_counter()
+    translate_grade2(document)
+    grade2 = time.perf_counter() - start
+
+    assert grade2 < 1.0
+    assert grade2 < 20 * grade1
+
+def test_text_to_braille_grade2():
+    output = asyncio.run(text_to_braille(BrailleInput(text="The child and the friend.", grade=2)))
+    assert output.braille_text == "⠠⠮ ⠡ ⠯ ⠮ ⠋⠗⠲"